@@ -0,0 +1,217 @@
+import json
+import sys
+from datetime import datetime
+from flask import (
+    Blueprint,
+    Response,
+    abort,
+    request,
+    stream_with_context,
+)
+from werkzeug.datastructures import MultiDict
+from forms import VenueForm, ShowForm, ArtistForm
+from models import Venue, Artist, Show, db
+from cache import page_cache, venue_pages, artist_pages, show_pages
+from deletes import background_deletes
+from entities import entity_cache
+from search import find_artists, find_shows, find_venues
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+RESOURCES = {
+    "venues": (Venue, VenueForm, find_venues),
+    "artists": (Artist, ArtistForm, find_artists),
+    "shows": (Show, ShowForm, find_shows),
+}
+
+# Rows are fetched from a server-side cursor in batches of this size while
+# a collection streams out.
+STREAM_BATCH_SIZE = 1000
+
+
+def _resource(name):
+    if name not in RESOURCES:
+        abort(404)
+    return RESOURCES[name]
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(repr(value))
+
+
+def _dumps(value):
+    return json.dumps(value, default=_default)
+
+
+# ?fields=id,name limits the selected columns; unknown names are rejected.
+def _columns(model):
+    columns = model.__table__.columns
+    fields = request.args.get("fields")
+    if not fields:
+        return [getattr(model, c.key) for c in columns]
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in columns]
+    if unknown:
+        abort(400, "Unknown fields: " + ", ".join(unknown))
+    return [getattr(model, name) for name in names]
+
+
+def _serialize(entity):
+    return {c.key: getattr(entity, c.key) for c in entity.__table__.columns}
+
+
+def _response(value, status=200):
+    return Response(_dumps(value), status=status, mimetype="application/json")
+
+
+# Streams the collection as a JSON array, or as one object per line when the
+# client asks for NDJSON, without materializing the rows in memory.
+def _stream(query):
+    keys = [column["name"] for column in query.column_descriptions]
+    rows = query.execution_options(stream_results=True).yield_per(STREAM_BATCH_SIZE)
+    ndjson = (
+        request.args.get("format") == "ndjson"
+        or request.accept_mimetypes.best == "application/x-ndjson"
+    )
+
+    def generate():
+        separator = "" if ndjson else "["
+        for row in rows:
+            yield separator + _dumps(dict(zip(keys, row)))
+            separator = "\n" if ndjson else ","
+        if ndjson:
+            yield "\n"
+        else:
+            yield "]" if separator == "," else "[]"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson" if ndjson else "application/json",
+    )
+
+
+def _form(form_class, values):
+    form = form_class(formdata=MultiDict(values))
+    form.validate()
+    if form_class is ShowForm:
+        if entity_cache.get(Artist, form.artist_id.data) is None:
+            form.artist_id.errors.append("This artist does not exist")
+        if entity_cache.get(Venue, form.venue_id.data) is None:
+            form.venue_id.errors.append("This venue does not exist")
+    if form.errors:
+        abort(_response({"errors": form.errors}, 400))
+    return form
+
+
+def _pages(entity):
+    if isinstance(entity, Venue):
+        return venue_pages(entity.id)
+    if isinstance(entity, Artist):
+        return artist_pages(entity.id)
+    return show_pages((entity.venue_id, entity.artist_id))
+
+
+# Commits and evicts the cached pages showing the entities, both as they
+# were (`pages`, collected before the change) and as they are now.
+def _commit(pages, *entities):
+    try:
+        db.session.flush()
+        pages = pages + [page for entity in entities for page in _pages(entity)]
+        db.session.commit()
+        page_cache.delete_many(*pages)
+    except Exception:
+        db.session.rollback()
+        print(sys.exc_info())
+        abort(400)
+
+
+#  Collections
+#  ----------------------------------------------------------------
+
+
+@api.route("/<resource>")
+def list_resource(resource):
+    model, _, _ = _resource(resource)
+    query = db.session.query(*_columns(model)).order_by(model.id)
+    after = request.args.get("after", type=int)
+    if after is not None:
+        query = query.filter(model.id > after)
+    limit = request.args.get("limit", type=int)
+    if limit is not None:
+        query = query.limit(limit)
+    return _stream(query)
+
+
+@api.route("/<resource>/search")
+def search_resource(resource):
+    _, _, find = _resource(resource)
+    count, rows = find(request.args.get("q", ""))
+    data = [row if isinstance(row, dict) else row._asdict() for row in rows]
+    for item in data:
+        item.pop("total", None)
+    return _response({"count": count, "data": data})
+
+
+@api.route("/<resource>", methods=["POST"])
+def create_resource(resource):
+    model, form_class, _ = _resource(resource)
+    form = _form(form_class, request.get_json(force=True) or {})
+    entity = model()
+    form.populate_obj(entity)
+    db.session.add(entity)
+    _commit([], entity)
+    return _response(_serialize(entity), 201)
+
+
+#  Single entities
+#  ----------------------------------------------------------------
+
+
+@api.route("/<resource>/<int:entity_id>")
+def get_resource(resource, entity_id):
+    model, _, _ = _resource(resource)
+    row = db.session.query(*_columns(model)).filter(model.id == entity_id).first()
+    if row is None:
+        abort(404)
+    return _response(row._asdict())
+
+
+# PUT replaces every field; PATCH merges the given fields into the current
+# ones. Either way the result is validated like the HTML forms.
+@api.route("/<resource>/<int:entity_id>", methods=["PUT", "PATCH"])
+def update_resource(resource, entity_id):
+    model, form_class, _ = _resource(resource)
+    entity = entity_cache.get(model, entity_id)
+    if entity is None:
+        abort(404)
+    values = _serialize(entity) if request.method == "PATCH" else {}
+    if "start_time" in values:
+        values["start_time"] = values["start_time"].strftime("%Y-%m-%d %H:%M:%S")
+    values.update(request.get_json(force=True) or {})
+    form = _form(form_class, values)
+    pages = _pages(entity)
+    form.populate_obj(entity)
+    _commit(pages, entity)
+    return _response(_serialize(entity))
+
+
+@api.route("/<resource>/<int:entity_id>", methods=["DELETE"])
+def delete_resource(resource, entity_id):
+    model, _, _ = _resource(resource)
+    entity = entity_cache.get(model, entity_id)
+    if entity is None:
+        abort(404)
+    pages = _pages(entity)
+    if model is not Show and background_deletes.defer(entity, pages):
+        return "", 202
+    db.session.delete(entity)
+    _commit(pages)
+    return "", 204
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+    return _response({"error": error.name, "message": error.description}, error.code)
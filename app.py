@@ -2,10 +2,9 @@
 # Imports
 # ----------------------------------------------------------------------------#
 
+import hmac
 import sys
 from datetime import datetime
-import dateutil.parser
-import babel
 from flask import (
     Flask,
     render_template,
@@ -14,16 +13,42 @@ from flask import (
     redirect,
     url_for,
     abort,
+    jsonify,
 )
 from flask_moment import Moment
-from sqlalchemy import or_
-from sqlalchemy.orm import joinedload
 import logging
 from logging import Formatter, FileHandler
+from logging.handlers import RotatingFileHandler
 from forms import VenueForm, ShowForm, ArtistForm
 from flask_migrate import Migrate
-from itertools import chain
 from models import Venue, Artist, Show, db
+from pagination import keyset_page, page_url
+from plans import check_plans
+from counters import roll_show_counters_command, reconcile_show_counters_command
+from cache import page_cache, venue_pages, artist_pages, show_pages
+from deletes import background_deletes
+from entities import entity_cache
+from api import api
+from streaming import render_listing
+from importer import import_command
+from exporter import export_command
+from partitions import archive_shows_command
+from assets import static_assets, build_assets_command
+from projections import (
+    detail_page,
+    show_card,
+    show_card_query,
+    venue_area_query,
+    venue_areas,
+)
+from search import find_artists, find_shows, find_venues
+from formatting import format_datetime
+from instrumentation import instrumentation
+from metrics import metrics
+from traffic import traffic
+from slowlog import slow_query_log, logger as slow_query_logger
+from replicas import ReplicaRouter, replica_reads
+from sessions import SessionLifecycle
 
 # ----------------------------------------------------------------------------#
 # App Config.
@@ -33,49 +58,34 @@ app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object("config")
 db.init_app(app)
+SessionLifecycle(db, app)
+page_cache.init_app(app)
+background_deletes.init_app(app)
+entity_cache.init_app(app)
+static_assets.init_app(app)
+instrumentation.init_app(app)
+metrics.init_app(app)
+traffic.init_app(app)
+slow_query_log.init_app(app)
+ReplicaRouter(db, app)
+app.register_blueprint(api)
 
 # TODO Done: connect to a local postgresql database
 migrate = Migrate(app, db)
+app.cli.add_command(check_plans)
+app.cli.add_command(roll_show_counters_command)
+app.cli.add_command(reconcile_show_counters_command)
+app.cli.add_command(import_command)
+app.cli.add_command(export_command)
+app.cli.add_command(archive_shows_command)
+app.cli.add_command(build_assets_command)
 
 # ----------------------------------------------------------------------------#
 # Filters and Helper Functions
 # ----------------------------------------------------------------------------#
 
-
-def format_datetime(value, format="medium"):
-    date = dateutil.parser.parse(value)
-    if format == "full":
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == "medium":
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
-
-
-# Function to get unique values
-def unique(list):
-    unique_list = []
-    for x in list:
-        if x not in unique_list:
-            unique_list.append(x)
-    return unique_list
-
-
-def getShowData(showlist):
-    data = []
-    for show in showlist:
-        showdata = {}
-        showdata["id"] = show.id
-        showdata["venue_id"] = show.venue_id
-        showdata["artist_id"] = show.artist_id
-        showdata["venue_name"] = Venue.query.get(show.venue.id).name
-        showdata["artist_name"] = Artist.query.get(show.artist_id).name
-        showdata["artist_image_link"] = Artist.query.get(show.artist_id).image_link
-        showdata["start_time"] = (show.start_time).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-        data.append(showdata)
-    return data
-
-
 app.jinja_env.filters["datetime"] = format_datetime
+app.jinja_env.globals["page_url"] = page_url
 
 # ----------------------------------------------------------------------------#
 # Controllers.
@@ -119,8 +129,6 @@ def create_venue_submission():
         db.session.rollback()
         error = True
         print(sys.exc_info())
-    finally:
-        db.session.close()
 
     if error:
         abort(400)
@@ -141,85 +149,41 @@ def create_venue_submission():
 def venues():
     # TODO Done: replace with real venues data.
     #       num_shows should be aggregated based on number of upcoming shows per venue.
-    venues = Venue.query.order_by("city", "state").all()
-
-    citiesAndStates = []
-    for venue in venues:
-        citiesAndStates.append([venue.city, venue.state])
-    citiesAndStates = unique(citiesAndStates)
-
-    areas = []
-
-    for cityAndState in citiesAndStates:
-        area = {}
-        area["city"] = cityAndState[0]
-        area["state"] = cityAndState[1]
-        filteredVenues = Venue.query.filter_by(
-            city=cityAndState[0], state=cityAndState[1]
-        ).all()
-        venues = []
-        for ven in filteredVenues:
-            venu = {}
-            venu["id"] = ven.id
-            venu["name"] = ven.name
-            venu["num_upcoming_shows"] = Show.query.filter(
-                Show.start_time >= datetime.now(), Show.venue_id == ven.id
-            ).count()
-            venues.append(venu)
-        area["venues"] = venues
-        areas.append(area)
-
-    return render_template("pages/venues.html", areas=areas)
+    page = keyset_page(
+        venue_area_query(),
+        [Venue.city, Venue.state, Venue.id],
+        key=lambda row: (row.city, row.state, row.id),
+        stream=app.config["STREAM_LISTINGS"],
+    )
+    areas = venue_areas(page.items)
+
+    return render_listing("pages/venues.html", areas=areas, page=page)
 
 
 @app.route("/venues/<int:venue_id>")
+@page_cache.cached("venue", Show.venue_id)
 def show_venue(venue_id):
-    venue_info = Venue.query.options(
-        joinedload("shows").options(joinedload("artist"))
-    ).get(venue_id)
-
-    data = venue_info.__dict__
-    past_shows = [r.__dict__ for r in venue_info.shows if r.start_time < datetime.now()]
-    upcoming_shows = [
-        r.__dict__ for r in venue_info.shows if r.start_time >= datetime.now()
-    ]
-
-    for show in past_shows:
-        show["start_time"] = show["start_time"].strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-        show["artist_image_link"] = show["artist"].__dict__["image_link"]
-        show["artist_name"] = show["artist"].__dict__["name"]
-
-    for show in upcoming_shows:
-        show["start_time"] = show["start_time"].strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-        show["artist_image_link"] = show["artist"].__dict__["image_link"]
-        show["artist_name"] = show["artist"].__dict__["name"]
-
-    data["past_shows"] = past_shows
-    data["upcoming_shows"] = upcoming_shows
-    data["past_shows_count"] = len(past_shows)
-    data["upcoming_shows_count"] = len(upcoming_shows)
-
+    data = detail_page(Venue, Show.venue_id, venue_id)
     return render_template("pages/show_venue.html", venue=data)
 
 
 @app.route("/venues/search", methods=["POST"])
+@replica_reads
 def search_venues():
     # TODO Done: implement search on artists with partial string search. Ensure it is case-insensitive.
     # seach for Hop should return "The Musical Hop".
     # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
     searchTerm = request.form.to_dict()["search_term"]
-    searchResult = Venue.query.filter(Venue.name.ilike("%" + searchTerm + "%")).all()
+    count, searchResult = find_venues(searchTerm)
     response = {}
-    response["count"] = len(searchResult)
+    response["count"] = count
 
     data = []
     for venue in searchResult:
         body = {}
         body["id"] = venue.id
         body["name"] = venue.name
-        body["num_upcoming_shows"] = Show.query.filter(
-            Show.venue_id == venue.id, Show.start_time >= datetime.now()
-        ).count()
+        body["num_upcoming_shows"] = venue.upcoming_shows_count
         data.append(body)
 
     response["data"] = data
@@ -237,7 +201,7 @@ def search_venues():
 
 @app.route("/venues/<int:venue_id>/edit", methods=["GET"])
 def edit_venue(venue_id):
-    venue = Venue.query.get(venue_id)
+    venue = entity_cache.get(Venue, venue_id)
     form = VenueForm(obj=venue)
     # TODO Done: populate form with values from venue with ID <venue_id>
     return render_template("forms/edit_venue.html", form=form, venue=venue)
@@ -248,7 +212,7 @@ def edit_venue_submission(venue_id):
     # TODO Done: take values from the form submitted, and update existing
     # venue record with ID <venue_id> using the new attributes
     form = VenueForm(request.form)
-    venue = Venue.query.get(venue_id)
+    venue = entity_cache.get(Venue, venue_id)
 
     if not form.validate_on_submit():
         return render_template("forms/edit_venue.html", form=form, venue=venue)
@@ -257,12 +221,11 @@ def edit_venue_submission(venue_id):
     try:
         form.populate_obj(venue)
         db.session.commit()
+        page_cache.delete_many(*venue_pages(venue_id))
     except Exception:
         db.session.rollback()
         error = True
         print(sys.exc_info())
-    finally:
-        db.session.close()
 
     if error:
         abort(400)
@@ -281,20 +244,25 @@ def delete_venue(venue_id):
     # TODO Done: Complete this endpoint for taking a venue_id, and using
     # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
     error = False
+    deferred = False
     try:
-        venue = Venue.query.get(venue_id)
-        db.session.delete(venue)
-        db.session.commit()
+        venue = entity_cache.get(Venue, venue_id)
+        pages = venue_pages(venue_id)
+        deferred = background_deletes.defer(venue, pages)
+        if not deferred:
+            db.session.delete(venue)
+            db.session.commit()
+            page_cache.delete_many(*pages)
     except Exception:
         db.session.rollback()
         error = True
         print(sys.exc_info())
-    finally:
-        db.session.close()
 
     if error:
         abort(400)
         flash("An error occured.  Venue could not be deleted!")
+    elif deferred:
+        flash("Venue is being deleted.")
     else:
         flash("Venue was successfully deleted!")
 
@@ -334,8 +302,6 @@ def create_artist_submission():
         db.session.rollback()
         error = True
         print(sys.exc_info())
-    finally:
-        db.session.close()
 
     if error:
         abort(400)
@@ -354,60 +320,39 @@ def create_artist_submission():
 def artists():
     # TODO Done: replace with real data returned from querying the database
 
-    artists = Artist.query.order_by("id").all()
-    return render_template("pages/artists.html", artists=artists)
+    page = keyset_page(
+        Artist.query.with_entities(Artist.id, Artist.name),
+        [Artist.id],
+        key=lambda row: (row.id,),
+        stream=app.config["STREAM_LISTINGS"],
+    )
+    return render_listing("pages/artists.html", artists=page.items, page=page)
 
 
 @app.route("/artists/<int:artist_id>")
+@page_cache.cached("artist", Show.artist_id)
 def show_artist(artist_id):
-    artist_info = Artist.query.options(
-        joinedload("shows").options(joinedload("venue"))
-    ).get(artist_id)
-
-    data = artist_info.__dict__
-    past_shows = [
-        r.__dict__ for r in artist_info.shows if r.start_time < datetime.now()
-    ]
-    upcoming_shows = [
-        r.__dict__ for r in artist_info.shows if r.start_time >= datetime.now()
-    ]
-
-    for show in past_shows:
-        show["start_time"] = show["start_time"].strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-        show["venue_image_link"] = show["venue"].__dict__["image_link"]
-        show["venue_name"] = show["venue"].__dict__["name"]
-
-    for show in upcoming_shows:
-        show["start_time"] = show["start_time"].strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-        show["venue_image_link"] = show["venue"].__dict__["image_link"]
-        show["venue_name"] = show["venue"].__dict__["name"]
-
-    data["past_shows"] = past_shows
-    data["upcoming_shows"] = upcoming_shows
-    data["past_shows_count"] = len(past_shows)
-    data["upcoming_shows_count"] = len(upcoming_shows)
-
+    data = detail_page(Artist, Show.artist_id, artist_id)
     return render_template("pages/show_artist.html", artist=data)
 
 
 @app.route("/artists/search", methods=["POST"])
+@replica_reads
 def search_artists():
     # TODO Done: implement search on artists with partial string search. Ensure it is case-insensitive.
     # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
     # search for "band" should return "The Wild Sax Band".
     searchTerm = request.form.to_dict()["search_term"]
-    searchResult = Artist.query.filter(Artist.name.ilike("%" + searchTerm + "%")).all()
+    count, searchResult = find_artists(searchTerm)
     response = {}
-    response["count"] = len(searchResult)
+    response["count"] = count
 
     data = []
     for artist in searchResult:
         body = {}
         body["id"] = artist.id
         body["name"] = artist.name
-        body["num_upcoming_shows"] = Show.query.filter(
-            Show.artist_id == artist.id, Show.start_time >= datetime.now()
-        ).count()
+        body["num_upcoming_shows"] = artist.upcoming_shows_count
         data.append(body)
 
     response["data"] = data
@@ -423,7 +368,7 @@ def search_artists():
 #  ----------------------------------------------------------------
 @app.route("/artists/<int:artist_id>/edit", methods=["GET"])
 def edit_artist(artist_id):
-    artist = Artist.query.get(artist_id)
+    artist = entity_cache.get(Artist, artist_id)
     form = ArtistForm(obj=artist)
     # TODO Done: populate form with fields from artist with ID <artist_id>
     return render_template("forms/edit_artist.html", form=form, artist=artist)
@@ -434,7 +379,7 @@ def edit_artist_submission(artist_id):
     # TODO Done: take values from the form submitted, and update existing
     # artist record with ID <artist_id> using the new attributes
     form = ArtistForm(request.form)
-    artist = Artist.query.get(artist_id)
+    artist = entity_cache.get(Artist, artist_id)
 
     if not form.validate_on_submit():
         return render_template("forms/edit_artist.html", form=form, artist=artist)
@@ -443,12 +388,11 @@ def edit_artist_submission(artist_id):
     try:
         form.populate_obj(artist)
         db.session.commit()
+        page_cache.delete_many(*artist_pages(artist_id))
     except Exception:
         db.session.rollback()
         error = True
         print(sys.exc_info())
-    finally:
-        db.session.close()
 
     if error:
         abort(400)
@@ -467,20 +411,25 @@ def edit_artist_submission(artist_id):
 def delete_artist(artist_id):
     # TODO Done: Complete this endpoint
     error = False
+    deferred = False
     try:
-        artist = Artist.query.get(artist_id)
-        db.session.delete(artist)
-        db.session.commit()
+        artist = entity_cache.get(Artist, artist_id)
+        pages = artist_pages(artist_id)
+        deferred = background_deletes.defer(artist, pages)
+        if not deferred:
+            db.session.delete(artist)
+            db.session.commit()
+            page_cache.delete_many(*pages)
     except Exception:
         db.session.rollback()
         error = True
         print(sys.exc_info())
-    finally:
-        db.session.close()
 
     if error:
         abort(400)
         flash("An error occured.  Artist could not be deleted")
+    elif deferred:
+        flash("Artist is being deleted.")
     else:
         flash("Artist was successfully deleted!")
 
@@ -509,8 +458,8 @@ def create_show_submission():
 
     validEntry = form.validate_on_submit()
 
-    artistExists = Artist.query.filter_by(id=form.artist_id.data).scalar()
-    venueExists = Venue.query.filter_by(id=form.venue_id.data).scalar()
+    artistExists = entity_cache.get(Artist, form.artist_id.data)
+    venueExists = entity_cache.get(Venue, form.venue_id.data)
     if artistExists is None:
         form.artist_id.errors.append("This artist does not exist")
         validEntry = False
@@ -527,12 +476,11 @@ def create_show_submission():
         form.populate_obj(show)
         db.session.add(show)
         db.session.commit()
+        page_cache.delete_many(*show_pages((show.venue_id, show.artist_id)))
     except Exception:
         db.session.rollback()
         error = True
         print(sys.exc_info())
-    finally:
-        db.session.close()
 
     if error:
         abort(400)
@@ -555,42 +503,46 @@ def shows():
     # displays list of shows at /shows
     # TODO Done: replace with real venues data.
     #       num_shows should be aggregated based on number of upcoming shows per venue.
-    past_shows = Show.query.filter(Show.start_time < datetime.now()).all()
-    upcoming_shows = Show.query.filter(Show.start_time >= datetime.now()).all()
-
-    pastshowdata = getShowData(past_shows)
-    upcomingshowdata = getShowData(upcoming_shows)
+    now = datetime.now()
+    upcoming_page = keyset_page(
+        show_card_query(Show.start_time >= now),
+        [Show.start_time, Show.id],
+        key=lambda row: (row.start_time, row.id),
+        prefix="upcoming_",
+        stream=app.config["STREAM_LISTINGS"],
+    )
+    past_page = keyset_page(
+        show_card_query(Show.start_time < now),
+        [Show.start_time, Show.id],
+        key=lambda row: (row.start_time, row.id),
+        prefix="past_",
+        descending=True,
+        stream=app.config["STREAM_LISTINGS"],
+    )
 
-    return render_template(
-        "pages/shows.html", upcoming_shows=upcomingshowdata, past_shows=pastshowdata
+    # Counts are passed as callables so they run when the template reaches
+    # them, after the page header has been sent in streaming mode.
+    return render_listing(
+        "pages/shows.html",
+        upcoming_shows=(show_card(row) for row in upcoming_page.items),
+        past_shows=(show_card(row) for row in past_page.items),
+        upcoming_shows_count=Show.query.filter(Show.start_time >= now).count,
+        past_shows_count=Show.query.filter(Show.start_time < now).count,
+        upcoming_page=upcoming_page,
+        past_page=past_page,
     )
 
 
 @app.route("/shows/search", methods=["POST"])
+@replica_reads
 def search_shows():
     searchTerm = request.form.to_dict()["search_term"]
-    venueSearch = (
-        Venue.query.with_entities(Venue.id)
-        .filter(Venue.name.ilike("%" + searchTerm + "%"))
-        .all()
-    )
-    artistSearch = (
-        Artist.query.with_entities(Artist.id)
-        .filter(Artist.name.ilike("%" + searchTerm + "%"))
-        .all()
-    )
-
-    showSearch = Show.query.filter(
-        or_(
-            Show.artist_id.in_(list(chain(*artistSearch))),
-            Show.venue_id.in_(list(chain(*venueSearch))),
-        )
-    ).all()
+    showcount, showSearch = find_shows(searchTerm)
 
     return render_template(
         "pages/search_shows.html",
-        showcount=len(showSearch),
-        shows=getShowData(showSearch),
+        showcount=showcount,
+        shows=showSearch,
         search_term=request.form.get("search_term", ""),
     )
 
@@ -601,7 +553,7 @@ def search_shows():
 
 @app.route("/shows/<int:show_id>/edit", methods=["GET"])
 def edit_show(show_id):
-    show = Show.query.get(show_id)
+    show = entity_cache.get(Show, show_id)
     form = ShowForm(obj=show)
     return render_template("forms/edit_show.html", form=form, show=show)
 
@@ -609,12 +561,12 @@ def edit_show(show_id):
 @app.route("/shows/<int:show_id>/edit", methods=["POST"])
 def edit_show_submission(show_id):
     form = ShowForm(request.form)
-    show = Show.query.get(show_id)
+    show = entity_cache.get(Show, show_id)
 
     validEntry = form.validate_on_submit()
 
-    artistExists = Artist.query.filter_by(id=form.artist_id.data).scalar()
-    venueExists = Venue.query.filter_by(id=form.venue_id.data).scalar()
+    artistExists = entity_cache.get(Artist, form.artist_id.data)
+    venueExists = entity_cache.get(Venue, form.venue_id.data)
     if artistExists is None:
         form.artist_id.errors.append("This artist does not exist")
         validEntry = False
@@ -627,14 +579,14 @@ def edit_show_submission(show_id):
 
     error = False
     try:
+        pages = show_pages((show.venue_id, show.artist_id))
         form.populate_obj(show)
         db.session.commit()
+        page_cache.delete_many(*pages, *show_pages((show.venue_id, show.artist_id)))
     except Exception:
         db.session.rollback()
         error = True
         print(sys.exc_info())
-    finally:
-        db.session.close()
 
     if error:
         abort(400)
@@ -653,15 +605,15 @@ def edit_show_submission(show_id):
 def delete_show(show_id):
     error = False
     try:
-        show = Show.query.get(show_id)
+        show = entity_cache.get(Show, show_id)
+        pages = show_pages((show.venue_id, show.artist_id))
         db.session.delete(show)
         db.session.commit()
+        page_cache.delete_many(*pages)
     except Exception:
         db.session.rollback()
         error = True
         print(sys.exc_info())
-    finally:
-        db.session.close()
 
     if error:
         abort(400)
@@ -672,6 +624,43 @@ def delete_show(show_id):
     return redirect(url_for("index"), code=200)
 
 
+#  Cache
+#  ----------------------------------------------------------------
+
+
+@app.route("/cache/stats")
+def cache_stats():
+    return jsonify(page_cache.stats())
+
+
+#  Metrics
+#  ----------------------------------------------------------------
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return metrics.response()
+
+
+#  Instrumentation
+#  ----------------------------------------------------------------
+
+
+# Switches request instrumentation in every worker. Needs
+# INSTRUMENTATION_TOKEN in an "Authorization: Bearer" header, which a
+# cross-site form cannot send; without a token configured it cannot be
+# switched over HTTP.
+@app.route("/instrumentation", methods=["GET", "POST"])
+def toggle_instrumentation():
+    if request.method == "POST":
+        token = app.config.get("INSTRUMENTATION_TOKEN")
+        supplied = request.headers.get("Authorization", "")
+        if not token or not hmac.compare_digest(supplied, "Bearer " + token):
+            abort(403)
+        instrumentation.switch(request.form.get("enabled", "1") in ("1", "true", "on"))
+    return jsonify({"enabled": instrumentation.enabled})
+
+
 #  Error Handlers
 #  ----------------------------------------------------------------
 
@@ -696,6 +685,20 @@ if not app.debug:
     app.logger.addHandler(file_handler)
     app.logger.info("errors")
 
+if app.config.get("SLOW_QUERY_THRESHOLD_MS") is not None:
+    slow_query_handler = RotatingFileHandler(
+        app.config["SLOW_QUERY_LOG_PATH"],
+        maxBytes=app.config.get("SLOW_QUERY_LOG_MAX_BYTES", 10 * 1024 * 1024),
+        backupCount=app.config.get("SLOW_QUERY_LOG_BACKUPS", 5),
+    )
+    # One JSON document per line; see slowlog.py.
+    slow_query_handler.setFormatter(
+        Formatter('{"time": "%(asctime)s", "slow_query": %(message)s}')
+    )
+    slow_query_logger.setLevel(logging.WARNING)
+    slow_query_logger.addHandler(slow_query_handler)
+    slow_query_logger.propagate = False
+
 # ----------------------------------------------------------------------------#
 # Launch.
 # ----------------------------------------------------------------------------#
@@ -0,0 +1,257 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import with_appcontext
+
+# Static asset pipeline. `flask build-assets` concatenates and minifies the
+# stylesheets and scripts of each bundle below, copies every other file
+# under static/ too, and writes them to static/dist/ under names carrying a
+# hash of their content, next to gzip and brotli variants of the text files
+# and a manifest.json mapping each source name to its output name. Files of
+# earlier builds are kept, so pages rendered before a deploy (e.g. in the
+# page cache) still find their assets.
+#
+# With a manifest present, url_for("static", filename=...) returns the
+# fingerprinted file and the static route serves dist/ files for a year as
+# immutable, picking the .br or .gz variant the client accepts. Without one
+# (or with STATIC_ASSETS off) the sources are served as they are.
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+
+BUNDLES = {
+    "css/app.css": [
+        "css/bootstrap.min.css",
+        "css/font-awesome.css",
+        "css/layout.main.css",
+        "css/main.css",
+        "css/main.responsive.css",
+        "css/main.quickfix.css",
+    ],
+    "js/head.js": [
+        "js/libs/modernizr-2.8.2.min.js",
+        "js/libs/moment.min.js",
+    ],
+    "js/app.js": [
+        "js/libs/jquery-1.11.1.min.js",
+        "js/libs/bootstrap-3.1.1.min.js",
+        "js/plugins.js",
+        "js/script.js",
+    ],
+}
+
+COMPRESSIBLE = {
+    "text/css",
+    "application/javascript",
+    "text/javascript",
+    "application/json",
+    "image/svg+xml",
+    "application/vnd.ms-fontobject",
+    "font/ttf",
+    "font/otf",
+}
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+CSS_TOKEN = re.compile(
+    r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|\s*([{};,>])\s*|/\*.*?\*/|\s+""", re.S
+)
+SOURCE_MAP = re.compile(r"^//[#@] sourceMappingURL=.*$", re.M)
+
+mimetypes.add_type("font/ttf", ".ttf")
+mimetypes.add_type("font/otf", ".otf")
+mimetypes.add_type("application/vnd.ms-fontobject", ".eot")
+
+
+def guess_type(name):
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+def fingerprinted(name, content):
+    stem, extension = os.path.splitext(name)
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    return "%s/%s.%s%s" % (DIST, stem, digest, extension)
+
+
+def minify_css(text):
+    def minified(match):
+        string, punctuation = match.groups()
+        if string is not None:
+            return string
+        if punctuation is not None:
+            return punctuation
+        return "" if match.group(0).startswith("/*") else " "
+
+    return CSS_TOKEN.sub(minified, text).replace(";}", "}").strip()
+
+
+# Strips indentation, blank lines and whole-line // comments, which cannot
+# change the meaning of the scripts here (none has multi-line strings).
+# Line breaks are kept for automatic semicolon insertion; already minified
+# files pass through unchanged.
+def minify_js(text):
+    lines = (line.strip() for line in SOURCE_MAP.sub("", text).splitlines())
+    return "\n".join(line for line in lines if line and not line.startswith("//"))
+
+
+# Points the url()s of a stylesheet at the fingerprinted files; `source` is
+# where the stylesheet was, `output` where it is written (only its directory
+# matters, which does not depend on the hash).
+def rewrite_css_urls(text, source, output, manifest):
+    def rewrite(match):
+        url = match.group(2)
+        if re.match(r"^([a-z]+:|/|#)", url):
+            return match.group(0)
+        path, suffix = re.match(r"^([^?#]*)(.*)$", url).groups()
+        target = os.path.normpath(os.path.join(os.path.dirname(source), path))
+        target = manifest.get(target.replace(os.sep, "/"), target)
+        relative = os.path.relpath(target, os.path.dirname(output))
+        return 'url("%s%s")' % (relative.replace(os.sep, "/"), suffix)
+
+    return CSS_URL.sub(rewrite, text)
+
+
+def write(static_folder, name, content):
+    path = os.path.join(static_folder, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as target:
+        target.write(content)
+    if guess_type(name) not in COMPRESSIBLE:
+        return
+    variants = [(".gz", gzip.compress(content, 9, mtime=0))]
+    try:
+        # Optional dependency; without it only gzip variants are written.
+        import brotli
+    except ImportError:
+        pass
+    else:
+        variants.append((".br", brotli.compress(content)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(content):
+            with open(path + suffix, "wb") as target:
+                target.write(compressed)
+
+
+def build(static_folder):
+    sources = []
+    for directory, subdirectories, files in os.walk(static_folder):
+        relative = os.path.relpath(directory, static_folder)
+        if relative.split(os.sep)[0] == DIST:
+            subdirectories[:] = []
+            continue
+        for filename in files:
+            sources.append(os.path.normpath(os.path.join(relative, filename)))
+    sources = sorted(source.replace(os.sep, "/") for source in sources)
+
+    def read(name):
+        with open(os.path.join(static_folder, name), "rb") as source:
+            return source.read()
+
+    # Stylesheets last: their url()s need the names of the files they load.
+    manifest = {}
+    for name in sorted(sources, key=lambda name: name.endswith(".css")):
+        content = read(name)
+        if name.endswith(".css"):
+            content = rewrite_css_urls(
+                content.decode("utf-8"), name, os.path.join(DIST, name), manifest
+            ).encode("utf-8")
+        manifest[name] = fingerprinted(name, content)
+        write(static_folder, manifest[name], content)
+
+    for bundle, parts in BUNDLES.items():
+        if bundle.endswith(".css"):
+            text = "\n".join(
+                rewrite_css_urls(
+                    minify_css(read(part).decode("utf-8")),
+                    part,
+                    os.path.join(DIST, bundle),
+                    manifest,
+                )
+                for part in parts
+            )
+        else:
+            text = ";\n".join(minify_js(read(part).decode("utf-8")) for part in parts)
+        content = text.encode("utf-8")
+        manifest[bundle] = fingerprinted(bundle, content)
+        write(static_folder, manifest[bundle], content)
+
+    with open(os.path.join(static_folder, DIST, MANIFEST), "w") as target:
+        json.dump(manifest, target, indent=2, sort_keys=True)
+    return manifest
+
+
+class StaticAssets:
+    def __init__(self, app=None):
+        self.manifest = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.jinja_env.globals["asset_urls"] = self.urls
+        if not app.config.get("STATIC_ASSETS", True):
+            return
+        path = os.path.join(app.static_folder, DIST, MANIFEST)
+        if not os.path.exists(path):
+            return
+        with open(path) as source:
+            self.manifest = json.load(source)
+        self.max_age = app.config.get("STATIC_ASSETS_MAX_AGE", 365 * 24 * 60 * 60)
+        app.url_defaults(self._fingerprint)
+        app.view_functions["static"] = self.send_static
+
+    # The URLs to load a bundle from: the bundle once built, its parts
+    # until then.
+    def urls(self, bundle):
+        if bundle in self.manifest:
+            return [url_for("static", filename=bundle)]
+        return [url_for("static", filename=part) for part in BUNDLES[bundle]]
+
+    def _fingerprint(self, endpoint, values):
+        if endpoint == "static" and values.get("filename") in self.manifest:
+            values["filename"] = self.manifest[values["filename"]]
+
+    def send_static(self, filename):
+        # Files of earlier builds are fingerprinted as well.
+        if not filename.startswith(DIST + "/") or filename == DIST + "/" + MANIFEST:
+            return current_app.send_static_file(filename)
+        mimetype = guess_type(filename)
+        served, encoding = filename, None
+        if mimetype in COMPRESSIBLE:
+            for suffix, candidate in ((".br", "br"), (".gz", "gzip")):
+                if request.accept_encodings[candidate] and os.path.isfile(
+                    os.path.join(current_app.static_folder, filename + suffix)
+                ):
+                    served, encoding = filename + suffix, candidate
+                    break
+        response = send_from_directory(
+            current_app.static_folder,
+            served,
+            mimetype=mimetype,
+            cache_timeout=self.max_age,
+        )
+        if encoding is not None:
+            response.headers["Content-Encoding"] = encoding
+        if mimetype in COMPRESSIBLE:
+            response.vary.add("Accept-Encoding")
+        response.headers["Cache-Control"] = "public, max-age=%d, immutable" % (
+            self.max_age
+        )
+        return response
+
+
+static_assets = StaticAssets()
+
+
+@click.command("build-assets")
+@with_appcontext
+def build_assets_command():
+    """Bundle, fingerprint and precompress the files under static/."""
+    manifest = build(current_app.static_folder)
+    click.echo(
+        "Wrote %d files to %s"
+        % (len(manifest), os.path.join(current_app.static_folder, DIST))
+    )
@@ -0,0 +1,71 @@
+import argparse
+import os
+
+# Event-loop serving mode: the same app, routes and templates served by
+# gevent's WSGI server, one greenlet per request. psycopg2 is switched to
+# its asynchronous mode with a wait callback, so a request waiting on
+# Postgres yields to the others instead of holding a thread; one process
+# keeps up to ASYNC_MAX_CONNECTIONS requests in flight. The number of
+# requests talking to the database at once is still bounded by the
+# connection pool (DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW).
+#
+#   $ python async_server.py --port 5000
+#
+# patch() has to run before the app is imported, which is why this is a
+# script of its own; `python app.py` keeps serving the app synchronously.
+
+
+def wait_callback(connection):
+    from gevent.socket import wait_read, wait_write
+    from psycopg2 import OperationalError, extensions
+
+    while True:
+        state = connection.poll()
+        if state == extensions.POLL_OK:
+            return
+        if state == extensions.POLL_READ:
+            wait_read(connection.fileno())
+        elif state == extensions.POLL_WRITE:
+            wait_write(connection.fileno())
+        else:
+            raise OperationalError("Bad result from poll: %r" % state)
+
+
+def patch():
+    from gevent import monkey
+
+    monkey.patch_all()
+    try:
+        from psycopg2 import extensions
+    except ImportError:
+        # SQLite-only installs: queries block the loop, as they would a thread.
+        return
+    extensions.set_wait_callback(wait_callback)
+
+
+def serve(app, host="127.0.0.1", port=5000, max_connections=None):
+    from gevent.pool import Pool
+    from gevent.pywsgi import WSGIServer
+
+    max_connections = max_connections or app.config.get("ASYNC_MAX_CONNECTIONS", 1000)
+    server = WSGIServer((host, port), app, spawn=Pool(max_connections), log=None)
+    server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python async_server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 5000)))
+    parser.add_argument(
+        "--max-connections", type=int, help="default: ASYNC_MAX_CONNECTIONS"
+    )
+    args = parser.parse_args(argv)
+
+    patch()
+    from app import app
+
+    serve(app, args.host, args.port, args.max_connections)
+
+
+if __name__ == "__main__":
+    main()
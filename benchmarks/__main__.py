@@ -0,0 +1,301 @@
+import argparse
+import json
+import os
+import sys
+
+# python -m benchmarks seed|run|load|serve|replay|dates|compare, see the Benchmarks section of the
+# README. The database is picked with --database-url (DATABASE_URL by
+# default) before the app is imported.
+
+
+def _app(args):
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    for name in ("pool_size", "max_overflow"):
+        if getattr(args, name, None) is not None:
+            os.environ["DATABASE_" + name.upper()] = str(getattr(args, name))
+    if getattr(args, "pgbouncer", False):
+        os.environ["DATABASE_PGBOUNCER"] = "1"
+    from app import app
+
+    app.config["PAGE_CACHE_TYPE"] = args.page_cache
+    from cache import page_cache
+
+    page_cache.init_app(app)
+    # Production-like rendering: no template reloading checks.
+    app.debug = False
+    return app
+
+
+def _seed(app, args):
+    from benchmarks.data import Catalogue, seed
+
+    catalogue = Catalogue(args.seed)
+    with app.app_context():
+        seed(catalogue, args.venues, args.artists, args.shows, reset=args.reset)
+    return catalogue
+
+
+def _meta(app, args):
+    from models import db
+
+    with app.app_context():
+        database = db.engine.dialect.name
+    return {
+        "database": database,
+        "seed": args.seed,
+        "venues": args.venues,
+        "artists": args.artists,
+        "shows": args.shows,
+        "requests": getattr(args, "requests", None),
+        "page_cache": args.page_cache,
+    }
+
+
+def seed_command(args):
+    app = _app(args)
+    _seed(app, args)
+    print(
+        "Seeded %d venues, %d artists, %d shows"
+        % (args.venues, args.artists, args.shows)
+    )
+
+
+def run_command(args):
+    from benchmarks import report, runner
+
+    app = _app(args)
+    catalogue = _seed(app, args)
+    fixtures = runner.Fixtures(app, catalogue)
+    missing = runner.uncovered_endpoints(app, runner.scenarios(fixtures))
+    if missing:
+        print("warning: no scenario for " + ", ".join(missing), file=sys.stderr)
+
+    routes = runner.run(
+        app,
+        fixtures,
+        requests=args.requests,
+        warmup=args.warmup,
+        memory_requests=args.memory_requests,
+        only=args.only,
+    )
+    result = report.build(_meta(app, args), routes)
+    report.save(result, args.output)
+    print("Report written to %s" % args.output)
+
+    if args.baseline:
+        rows, regressions = report.compare(
+            report.load(args.baseline), result, args.tolerance
+        )
+        print(report.format_comparison(rows))
+        return 1 if regressions else 0
+    return 0
+
+
+def load_command(args):
+    from benchmarks import load, runner
+
+    app = _app(args)
+    catalogue = _seed(app, args)
+    result = load.load(
+        app, runner.Fixtures(app, catalogue), args.threads, args.requests
+    )
+    print(json.dumps(result, indent=2))
+    bound = result["connection_bound"]
+    if bound is not None and result["max_open_connections"] > bound:
+        print("More connections were opened than the pool allows", file=sys.stderr)
+        return 1
+    return 0
+
+
+def serve_command(args):
+    from benchmarks import runner, serving
+
+    app = _app(args)
+    from models import db
+
+    with app.app_context():
+        url = db.engine.url
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        print("serve needs a database the servers can share", file=sys.stderr)
+        return 2
+    catalogue = _seed(app, args)
+    result = serving.compare(
+        runner.Fixtures(app, catalogue),
+        modes=args.mode or ("sync", "async"),
+        concurrency=args.concurrency,
+        duration=args.duration,
+        threads=args.threads,
+        max_connections=args.max_connections,
+        latency_ms=args.latency_ms,
+        page_cache=args.page_cache,
+    )
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+def replay_command(args):
+    from benchmarks import replay, report
+
+    entries = replay.load_capture(args.capture)
+    routes = replay.replay(
+        args.base_url, entries, args.speedup, args.concurrency, args.timeout
+    )
+    for name, result in routes.items():
+        print(
+            "%-28s p50 %8s ms  p95 %8s ms  %5d requests  %s"
+            % (
+                name,
+                result["p50_ms"],
+                result["p95_ms"],
+                result["requests"],
+                result["statuses"],
+            )
+        )
+    meta = {
+        "capture": args.capture,
+        "base_url": args.base_url,
+        "speedup": args.speedup,
+        "concurrency": args.concurrency,
+        "requests": len(entries),
+    }
+    result = report.build(meta, routes)
+    report.save(result, args.output)
+    print("Report written to %s" % args.output)
+
+    if args.baseline:
+        rows, regressions = report.compare(
+            report.load(args.baseline), result, args.tolerance
+        )
+        print(report.format_comparison(rows))
+        return 1 if regressions else 0
+    return 0
+
+
+def dates_command(args):
+    from benchmarks import dates
+
+    for format, result in dates.compare(args.count, args.repeat).items():
+        print(
+            "%-7s legacy %7.2f us  current %7.2f us  %5.1fx"
+            % (format, result["legacy_us"], result["current_us"], result["speedup"])
+        )
+    return 0
+
+
+def compare_command(args):
+    from benchmarks import report
+
+    rows, regressions = report.compare(
+        report.load(args.baseline), report.load(args.report), args.tolerance
+    )
+    print(report.format_comparison(rows))
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    database = argparse.ArgumentParser(add_help=False)
+    database.add_argument(
+        "--database-url",
+        help="e.g. sqlite:///bench.db or postgresql://localhost/fyyur_bench",
+    )
+    database.add_argument(
+        "--page-cache", choices=("null", "lru"), default="null", help="default: null"
+    )
+    database.add_argument("--seed", type=int, default=0)
+    database.add_argument("--venues", type=int, default=1000)
+    database.add_argument("--artists", type=int, default=1000)
+    database.add_argument("--shows", type=int, default=20000)
+    database.add_argument(
+        "--no-reset",
+        dest="reset",
+        action="store_false",
+        help="Add to the existing tables instead of recreating them.",
+    )
+
+    seed = commands.add_parser("seed", parents=[database], help="Seed a database.")
+    seed.set_defaults(handler=seed_command)
+
+    run = commands.add_parser(
+        "run", parents=[database], help="Seed a database and time every route."
+    )
+    run.add_argument("--requests", type=int, default=50, help="Timed, per route.")
+    run.add_argument("--warmup", type=int, default=3)
+    run.add_argument("--memory-requests", type=int, default=3)
+    run.add_argument(
+        "--only", action="append", help="Only routes whose name contains this."
+    )
+    run.add_argument("--output", default="benchmark-report.json")
+    run.add_argument("--baseline", help="Report to compare against.")
+    run.add_argument("--tolerance", type=float, default=0.2)
+    run.set_defaults(handler=run_command)
+
+    load = commands.add_parser(
+        "load",
+        parents=[database],
+        help="Run concurrent requests and report the connections used.",
+    )
+    load.add_argument("--threads", type=int, default=32)
+    load.add_argument("--requests", type=int, default=2000)
+    load.add_argument("--pool-size", type=int)
+    load.add_argument("--max-overflow", type=int)
+    load.add_argument("--pgbouncer", action="store_true", help="No app-side pool.")
+    load.set_defaults(handler=load_command)
+
+    serve = commands.add_parser(
+        "serve",
+        parents=[database],
+        help="Compare the throughput of the sync and async serving modes.",
+    )
+    serve.add_argument(
+        "--mode", action="append", choices=("sync", "async"), help="default: both"
+    )
+    serve.add_argument("--concurrency", type=int, default=200)
+    serve.add_argument("--duration", type=float, default=10, help="Seconds per mode.")
+    serve.add_argument("--threads", type=int, default=16, help="Sync worker threads.")
+    serve.add_argument("--max-connections", type=int, help="Async requests in flight.")
+    serve.add_argument(
+        "--latency-ms", type=float, default=0, help="Added to every SQL statement."
+    )
+    serve.add_argument("--pool-size", type=int)
+    serve.add_argument("--max-overflow", type=int)
+    serve.set_defaults(handler=serve_command)
+
+    replay = commands.add_parser(
+        "replay", help="Play a traffic capture back against a running instance."
+    )
+    replay.add_argument("capture", help="JSONL file written with TRAFFIC_CAPTURE.")
+    replay.add_argument("--base-url", default="http://127.0.0.1:5000")
+    replay.add_argument(
+        "--speedup", type=float, default=1.0, help="0: as fast as possible."
+    )
+    replay.add_argument("--concurrency", type=int, default=16)
+    replay.add_argument("--timeout", type=float, default=30)
+    replay.add_argument("--output", default="replay-report.json")
+    replay.add_argument("--baseline", help="Report of a previous replay.")
+    replay.add_argument("--tolerance", type=float, default=0.2)
+    replay.set_defaults(handler=replay_command)
+
+    dates = commands.add_parser(
+        "dates", help="Time the datetime template filter against the old one."
+    )
+    dates.add_argument("--count", type=int, default=2000)
+    dates.add_argument("--repeat", type=int, default=5)
+    dates.set_defaults(handler=dates_command)
+
+    compare = commands.add_parser("compare", help="Compare two reports.")
+    compare.add_argument("baseline")
+    compare.add_argument("report")
+    compare.add_argument("--tolerance", type=float, default=0.2)
+    compare.set_defaults(handler=compare_command)
+
+    args = parser.parse_args(argv)
+    return args.handler(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
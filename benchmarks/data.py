@@ -0,0 +1,160 @@
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+from forms import STATES, GENRES
+from models import Venue, Artist, Show, db
+from importer import insert_rows
+from counters import reconcile_show_counters
+
+# Synthetic catalogue for the benchmarks. Everything is drawn from one
+# seeded generator, so the same seed and sizes give the same rows. States,
+# cities, genres and show bookings follow long-tailed (Zipf-like) weights,
+# like the real catalogue: a few big cities and popular venues and artists,
+# and many small ones.
+
+ADJECTIVES = """
+Blue Golden Velvet Electric Silver Crimson Lucky Wild Midnight Rusty
+Neon Quiet Broken Happy Little
+""".split()
+VENUE_NOUNS = """
+Room Hall Lounge Garden Tavern Theatre Cellar Ballroom Club Warehouse
+Cafe Stage
+""".split()
+ARTIST_NOUNS = """
+Foxes Engines Rivers Ghosts Kings Echoes Sparrows Machines Saints
+Wolves Lanterns Strangers
+""".split()
+CITY_PREFIXES = "Spring Lake Fair River Oak Green Bright".split()
+CITY_SUFFIXES = "field ville ton port dale wood burg".split()
+STREETS = ("Main St", "Market St", "Park Ave", "Broadway", "Elm St")
+
+# Shows are spread over this window around the time of seeding.
+PAST_DAYS = 365
+UPCOMING_DAYS = 180
+
+
+def zipf_weights(count, exponent=1.0):
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+class Catalogue:
+    def __init__(self, seed=0, now=None):
+        self.rng = random.Random(seed)
+        self.now = (now or datetime.now()).replace(second=0, microsecond=0)
+        self.states = [value for value, _ in STATES]
+        self.rng.shuffle(self.states)
+        self.state_weights = zipf_weights(len(self.states))
+        self.genres = [value for value, _ in GENRES]
+        self.rng.shuffle(self.genres)
+        self.genre_weights = zipf_weights(len(self.genres))
+        self.cities = {
+            state: [
+                self.rng.choice(CITY_PREFIXES) + self.rng.choice(CITY_SUFFIXES)
+                for _ in range(5)
+            ]
+            for state in self.states
+        }
+        self.city_weights = zipf_weights(5, 1.5)
+
+    def _place(self):
+        rng = self.rng
+        state = rng.choices(self.states, cum_weights=self.state_weights)[0]
+        city = rng.choices(self.cities[state], cum_weights=self.city_weights)[0]
+        return city, state
+
+    def _genres(self):
+        count = self.rng.choices((1, 2, 3), weights=(5, 3, 1))[0]
+        genres = set()
+        while len(genres) < count:
+            genres.add(self.rng.choices(self.genres, cum_weights=self.genre_weights)[0])
+        return sorted(genres)
+
+    def _entity(self, name, slug):
+        rng = self.rng
+        city, state = self._place()
+        return {
+            "name": name,
+            "city": city,
+            "state": state,
+            "phone": "".join(rng.choice("0123456789") for _ in range(10)),
+            "image_link": "https://images.example.com/%s.jpg" % slug,
+            "facebook_link": "https://www.facebook.com/%s" % slug,
+            "website": "https://%s.example.com" % slug,
+            "genres": self._genres(),
+            "seeking_description": None,
+        }
+
+    def venue(self, number):
+        rng = self.rng
+        values = self._entity(
+            "The %s %s %d" % (rng.choice(ADJECTIVES), rng.choice(VENUE_NOUNS), number),
+            "venue-%d" % number,
+        )
+        values["address"] = "%d %s" % (rng.randint(1, 9999), rng.choice(STREETS))
+        values["seeking_talent"] = rng.random() < 0.3
+        if values["seeking_talent"]:
+            values["seeking_description"] = "Booking local acts."
+        return values
+
+    def artist(self, number):
+        rng = self.rng
+        values = self._entity(
+            "The %s %s %d" % (rng.choice(ADJECTIVES), rng.choice(ARTIST_NOUNS), number),
+            "artist-%d" % number,
+        )
+        values["seeking_venue"] = rng.random() < 0.3
+        if values["seeking_venue"]:
+            values["seeking_description"] = "Looking for weekend gigs."
+        return values
+
+    def start_time(self):
+        minutes = self.rng.randrange(-PAST_DAYS * 48, UPCOMING_DAYS * 48) * 30
+        return self.now + timedelta(minutes=minutes)
+
+    # `venue_ids` and `artist_ids` are taken in popularity order.
+    def shows(self, count, venue_ids, artist_ids):
+        venue_weights = zipf_weights(len(venue_ids), 0.8)
+        artist_weights = zipf_weights(len(artist_ids), 0.8)
+        venues = self.rng.choices(venue_ids, cum_weights=venue_weights, k=count)
+        artists = self.rng.choices(artist_ids, cum_weights=artist_weights, k=count)
+        for venue_id, artist_id in zip(venues, artists):
+            yield {
+                "venue_id": venue_id,
+                "artist_id": artist_id,
+                "start_time": self.start_time(),
+            }
+
+
+def form_data(values):
+    data = {}
+    for key, value in values.items():
+        if value is None or value is False:
+            continue
+        if value is True:
+            value = "y"
+        elif isinstance(value, datetime):
+            value = value.strftime("%Y-%m-%d %H:%M:%S")
+        data[key] = value
+    return data
+
+
+def _insert(model, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        insert_rows(model, rows[start : start + batch_size])
+        db.session.commit()
+
+
+# Fills the database of the current app context; with reset=True every
+# table is dropped and recreated first. Counters are rebuilt at the end.
+def seed(catalogue, venues, artists, shows, reset=False, batch_size=5000):
+    if reset:
+        db.drop_all()
+    db.create_all()
+
+    _insert(Venue, [catalogue.venue(number) for number in range(venues)], batch_size)
+    _insert(Artist, [catalogue.artist(number) for number in range(artists)], batch_size)
+    venue_ids = [row.id for row in db.session.query(Venue.id).order_by(Venue.id)]
+    artist_ids = [row.id for row in db.session.query(Artist.id).order_by(Artist.id)]
+    if venue_ids and artist_ids:
+        _insert(Show, list(catalogue.shows(shows, venue_ids, artist_ids)), batch_size)
+    reconcile_show_counters()
@@ -0,0 +1,64 @@
+import time
+import babel.dates
+import dateutil.parser
+from formatting import format_datetime
+from benchmarks.data import Catalogue
+
+# Micro-benchmark of the `datetime` template filter: the previous path
+# (the view formats start_time as an ISO string, the filter parses it back
+# with dateutil and formats it with babel) against formatting.py, on the
+# same datetimes. Outputs must be identical.
+
+LEGACY_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+
+def legacy_format_datetime(value, format="medium"):
+    date = dateutil.parser.parse(value)
+    if format == "full":
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == "medium":
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def legacy(values, format):
+    return [
+        legacy_format_datetime(value.strftime(LEGACY_TIME_FORMAT), format)
+        for value in values
+    ]
+
+
+def current(values, format):
+    return [format_datetime(value, format) for value in values]
+
+
+def _best_of(repeat, function, *args):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def compare(count=2000, repeat=5, seed=0):
+    catalogue = Catalogue(seed)
+    values = [catalogue.start_time() for _ in range(count)]
+    results = {}
+    for format in ("full", "medium"):
+        legacy_time, legacy_output = _best_of(repeat, legacy, values, format)
+        current_time, current_output = _best_of(repeat, current, values, format)
+        if legacy_output != current_output:
+            mismatch = next(
+                (before, after)
+                for before, after in zip(legacy_output, current_output)
+                if before != after
+            )
+            raise AssertionError("%s: %r != %r" % ((format,) + mismatch))
+        results[format] = {
+            "legacy_us": round(legacy_time / count * 10**6, 2),
+            "current_us": round(current_time / count * 10**6, 2),
+            "speedup": round(legacy_time / current_time, 1),
+        }
+    return results
@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import Counter
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import NullPool, QueuePool
+from models import db
+from benchmarks.runner import search_form
+
+# Concurrent load against the app from `threads` threads, each with its own
+# test client, while the database connections the process holds are
+# tracked through pool events. On Postgres the connections the server sees
+# for the database are sampled too. With a QueuePool the open connections
+# must stay within pool size + overflow however many threads there are.
+
+
+class ConnectionTracker:
+    def __init__(self, pool):
+        self.pool = pool
+        self.open = 0
+        self.checked_out = 0
+        self.max_open = 0
+        self.max_checked_out = 0
+        self._lock = threading.Lock()
+        self._listeners = [
+            ("connect", self._connected),
+            ("close", self._closed),
+            ("checkout", self._checked_out),
+            ("checkin", self._checked_in),
+        ]
+
+    def __enter__(self):
+        if isinstance(self.pool, QueuePool):
+            self.open = self.pool.checkedin() + self.pool.checkedout()
+        for name, listener in self._listeners:
+            event.listen(self.pool, name, listener)
+        return self
+
+    def __exit__(self, *exc_info):
+        for name, listener in self._listeners:
+            event.remove(self.pool, name, listener)
+
+    def _connected(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.open += 1
+            self.max_open = max(self.max_open, self.open)
+
+    def _closed(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.open -= 1
+
+    def _checked_out(self, dbapi_connection, connection_record, proxy):
+        with self._lock:
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+    def _checked_in(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checked_out -= 1
+
+
+# Sampled over a connection of its own, outside the app's pool.
+def server_connections(engine):
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()"
+        )
+        return cursor.fetchone()[0] - 1
+    finally:
+        connection.close()
+
+
+def connection_bound(app):
+    options = app.config["SQLALCHEMY_ENGINE_OPTIONS"]
+    if "pool_size" not in options:
+        return None
+    return options["pool_size"] + max(options["max_overflow"], 0)
+
+
+def load(app, fixtures, threads=32, requests=2000):
+    with app.app_context():
+        engine = db.engine
+    monitor = create_engine(engine.url, poolclass=NullPool)
+    paths = [
+        ("GET", lambda n: "/venues", None),
+        ("GET", lambda n: "/venues/%d" % fixtures.venue(n), None),
+        ("GET", lambda n: "/artists/%d" % fixtures.artist(n), None),
+        ("GET", lambda n: "/shows", None),
+        ("POST", lambda n: "/artists/search", search_form),
+    ]
+    numbers = iter(range(requests))
+    lock = threading.Lock()
+    statuses = Counter()
+    server_samples = []
+    done = threading.Event()
+
+    def worker():
+        client = app.test_client(use_cookies=False)
+        while True:
+            with lock:
+                number = next(numbers, None)
+            if number is None:
+                return
+            method, path, data = paths[number % len(paths)]
+            response = client.open(
+                path(number), method=method, data=data and data(number)
+            )
+            response.close()
+            with lock:
+                statuses[response.status_code] += 1
+
+    def sample_server():
+        while not done.wait(0.05):
+            server_samples.append(server_connections(monitor))
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    with ConnectionTracker(engine.pool) as tracker:
+        sampler = None
+        if engine.dialect.name == "postgresql":
+            sampler = threading.Thread(target=sample_server)
+            sampler.start()
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        done.set()
+        if sampler is not None:
+            sampler.join()
+
+    return {
+        "threads": threads,
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1),
+        "statuses": {str(code): n for code, n in sorted(statuses.items())},
+        "pool": type(engine.pool).__name__,
+        "connection_bound": connection_bound(app),
+        "max_open_connections": tracker.max_open,
+        "max_checked_out": tracker.max_checked_out,
+        "max_server_connections": max(server_samples) if server_samples else None,
+    }
@@ -0,0 +1,121 @@
+import json
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlencode
+from benchmarks.runner import percentile
+
+# Plays a traffic capture (see traffic.py) back against a running instance.
+# Requests keep their recorded spacing divided by `speedup` (0 sends them
+# back to back) and at most `concurrency` are in flight; a request whose
+# turn comes while all are busy waits for one to finish. Redirects are not
+# followed, so each recorded request is one request. Latencies are grouped
+# per route, named like the routes of `python -m benchmarks run` so both
+# kinds of report compare with `python -m benchmarks compare`. When the
+# instance sends the Server-Timing header of request instrumentation, the
+# SQL statement counts are reported too.
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries')
+
+
+def load_capture(path):
+    with open(path) as source:
+        entries = [json.loads(line) for line in source if line.strip()]
+    return sorted(entries, key=lambda entry: entry["time"])
+
+
+def route_name(entry):
+    rule = entry.get("route") or entry["path"].split("?")[0]
+    return "%s %s" % (entry["method"], re.sub(r"<[^>]+>", "<id>", rule))
+
+
+class NoRedirects(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+opener = urllib.request.build_opener(NoRedirects)
+
+
+def send(base_url, entry, timeout):
+    data = None
+    headers = {}
+    if "json" in entry:
+        data = entry["json"].encode()
+        headers["Content-Type"] = "application/json"
+    elif "form" in entry:
+        data = urlencode(entry["form"], doseq=True).encode()
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+    outgoing = urllib.request.Request(
+        base_url.rstrip("/") + entry["path"],
+        data=data,
+        headers=headers,
+        method=entry["method"],
+    )
+    started = time.perf_counter()
+    try:
+        with opener.open(outgoing, timeout=timeout) as response:
+            response.read()
+            status, timing = response.status, response.headers.get("Server-Timing")
+    except urllib.error.HTTPError as error:
+        error.read()
+        status, timing = error.code, error.headers.get("Server-Timing")
+    except OSError:
+        return "error", None, None
+    elapsed = (time.perf_counter() - started) * 1000
+    match = SERVER_TIMING_QUERIES.search(timing or "")
+    return str(status), elapsed, int(match.group(1)) if match else None
+
+
+def replay(base_url, entries, speedup=1.0, concurrency=16, timeout=30):
+    results = defaultdict(list)
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(concurrency)
+
+    def run(entry):
+        try:
+            outcome = send(base_url, entry, timeout)
+        finally:
+            slots.release()
+        with lock:
+            results[route_name(entry)].append(outcome)
+
+    if not entries:
+        return {}
+    first = datetime.fromisoformat(entries[0]["time"])
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for entry in entries:
+            if speedup:
+                offset = (datetime.fromisoformat(entry["time"]) - first).total_seconds()
+                delay = started + offset / speedup - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            slots.acquire()
+            executor.submit(run, entry)
+
+    return {name: summarize(outcomes) for name, outcomes in sorted(results.items())}
+
+
+def summarize(outcomes):
+    timings = [elapsed for _, elapsed, _ in outcomes if elapsed is not None]
+    queries = [count for _, _, count in outcomes if count is not None]
+
+    def rounded(value):
+        return None if value is None else round(value, 3)
+
+    return {
+        "requests": len(outcomes),
+        "statuses": dict(sorted(Counter(status for status, _, _ in outcomes).items())),
+        "p50_ms": rounded(percentile(timings, 0.50)),
+        "p95_ms": rounded(percentile(timings, 0.95)),
+        "p99_ms": rounded(percentile(timings, 0.99)),
+        "mean_ms": rounded(sum(timings) / len(timings)) if timings else None,
+        "queries": percentile(queries, 0.50),
+        "max_queries": max(queries) if queries else None,
+    }
@@ -0,0 +1,89 @@
+import json
+import platform
+from datetime import datetime
+
+# Reports are JSON documents: run metadata (dataset sizes, database, Python)
+# and one entry per route. Comparing against a baseline flags a route whose
+# p95 latency grew by more than `tolerance` or that runs more queries.
+
+
+def build(meta, routes):
+    meta = dict(
+        meta,
+        created_at=datetime.now().isoformat(timespec="seconds"),
+        python=platform.python_version(),
+    )
+    return {"meta": meta, "routes": routes}
+
+
+def save(report, path):
+    with open(path, "w") as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+        output.write("\n")
+
+
+def load(path):
+    with open(path) as source:
+        return json.load(source)
+
+
+def compare(baseline, report, tolerance=0.2):
+    rows = []
+    regressions = []
+    for name, result in report["routes"].items():
+        before = baseline["routes"].get(name)
+        if before is None:
+            rows.append((name, None, result["p95_ms"], None, result["queries"], "new"))
+            continue
+        ratio = (
+            result["p95_ms"] / before["p95_ms"]
+            if before["p95_ms"] and result["p95_ms"] is not None
+            else 1
+        )
+        problems = []
+        if ratio > 1 + tolerance:
+            problems.append("slower")
+        # Replays only know the query counts of instrumented instances.
+        if None not in (result["queries"], before["queries"]) and (
+            result["queries"] > before["queries"]
+        ):
+            problems.append("more queries")
+        if problems:
+            regressions.append(name)
+        rows.append(
+            (
+                name,
+                before["p95_ms"],
+                result["p95_ms"],
+                before["queries"],
+                result["queries"],
+                ", ".join(problems) or "ok",
+            )
+        )
+    for name in sorted(set(baseline["routes"]) - set(report["routes"])):
+        rows.append(
+            (name, baseline["routes"][name]["p95_ms"], None, None, None, "gone")
+        )
+    return rows, regressions
+
+
+def format_comparison(rows):
+    def number(value):
+        return "-" if value is None else "%g" % value
+
+    lines = [
+        "%-28s %12s %12s %9s %s" % ("route", "p95 before", "p95 after", "queries", "")
+    ]
+    for name, p95_before, p95_after, queries_before, queries_after, verdict in rows:
+        lines.append(
+            "%-28s %12s %12s %4s>%-4s %s"
+            % (
+                name,
+                number(p95_before),
+                number(p95_after),
+                number(queries_before),
+                number(queries_after),
+                verdict,
+            )
+        )
+    return "\n".join(lines)
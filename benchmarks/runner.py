@@ -0,0 +1,328 @@
+import time
+import tracemalloc
+from collections import Counter, namedtuple
+from itertools import count
+from sqlalchemy import event
+from models import Venue, Artist, Show, db
+from benchmarks.data import form_data
+
+# Drives every route of app.py through the Flask test client. Each scenario
+# is requested `warmup` times untimed, then `requests` times timed: wall time
+# per request and the number of SQL statements it ran are recorded. Peak
+# Python memory is measured in a separate pass of `memory_requests`
+# requests, as tracing allocations slows the timed ones down.
+
+# `prepare(number)` runs untimed before each request and returns its path
+# and form data; it may create the row a delete request removes.
+Scenario = namedtuple("Scenario", "name endpoint method prepare")
+
+# Names, cities and genres of the synthetic catalogue, and a miss.
+SEARCH_TERMS = ("the", "blue", "hall", "foxes", "ville", "jazz", "rock n roll", "zz")
+
+
+def search_form(number):
+    return {"search_term": SEARCH_TERMS[number % len(SEARCH_TERMS)]}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Fixtures:
+    def __init__(self, app, catalogue):
+        self.app = app
+        self.catalogue = catalogue
+        self._numbers = count(10**6)
+        with app.app_context():
+            self.venue_ids = [row.id for row in db.session.query(Venue.id)]
+            self.artist_ids = [row.id for row in db.session.query(Artist.id)]
+            self.shows = db.session.query(Show.id, Show.venue_id, Show.artist_id).all()
+        if not (self.venue_ids and self.artist_ids and self.shows):
+            raise ValueError("The benchmark database has no venues, artists or shows")
+
+    def pick(self, items, number):
+        # Walks the rows with a stride so consecutive requests hit different
+        # rows (and different pages of the page cache).
+        return items[number * 7919 % len(items)]
+
+    def venue(self, number):
+        return self.pick(self.venue_ids, number)
+
+    def artist(self, number):
+        return self.pick(self.artist_ids, number)
+
+    def show(self, number):
+        return self.pick(self.shows, number)
+
+    def show_form(self, number):
+        return form_data(
+            {
+                "venue_id": self.venue(number),
+                "artist_id": self.artist(number + 1),
+                "start_time": self.catalogue.start_time(),
+            }
+        )
+
+    def create(self, model, values):
+        with self.app.app_context():
+            entity = model(**values)
+            db.session.add(entity)
+            db.session.commit()
+            return entity.id
+
+    def new_venue(self):
+        return self.create(Venue, self.catalogue.venue(next(self._numbers)))
+
+    def new_artist(self):
+        return self.create(Artist, self.catalogue.artist(next(self._numbers)))
+
+    def new_show(self):
+        show = next(self.catalogue.shows(1, self.venue_ids, self.artist_ids))
+        return self.create(Show, show)
+
+
+def scenarios(fixtures):
+    catalogue = fixtures.catalogue
+    return [
+        Scenario("GET /", "index", "GET", lambda n: ("/", None)),
+        Scenario("GET /venues", "venues", "GET", lambda n: ("/venues", None)),
+        Scenario(
+            "GET /venues/<id>",
+            "show_venue",
+            "GET",
+            lambda n: ("/venues/%d" % fixtures.venue(n), None),
+        ),
+        Scenario(
+            "GET /venues/<missing id>",
+            "show_venue",
+            "GET",
+            lambda n: ("/venues/%d" % (max(fixtures.venue_ids) + 10**6), None),
+        ),
+        Scenario(
+            "POST /venues/search",
+            "search_venues",
+            "POST",
+            lambda n: ("/venues/search", search_form(n)),
+        ),
+        Scenario(
+            "GET /venues/create",
+            "create_venue_form",
+            "GET",
+            lambda n: ("/venues/create", None),
+        ),
+        Scenario(
+            "POST /venues/create",
+            "create_venue_submission",
+            "POST",
+            lambda n: ("/venues/create", form_data(catalogue.venue(n))),
+        ),
+        Scenario(
+            "GET /venues/<id>/edit",
+            "edit_venue",
+            "GET",
+            lambda n: ("/venues/%d/edit" % fixtures.venue(n), None),
+        ),
+        Scenario(
+            "POST /venues/<id>/edit",
+            "edit_venue_submission",
+            "POST",
+            lambda n: (
+                "/venues/%d/edit" % fixtures.venue(n),
+                form_data(catalogue.venue(n)),
+            ),
+        ),
+        Scenario(
+            "DELETE /venues/<id>",
+            "delete_venue",
+            "DELETE",
+            lambda n: ("/venues/%d" % fixtures.new_venue(), None),
+        ),
+        Scenario("GET /artists", "artists", "GET", lambda n: ("/artists", None)),
+        Scenario(
+            "GET /artists/<id>",
+            "show_artist",
+            "GET",
+            lambda n: ("/artists/%d" % fixtures.artist(n), None),
+        ),
+        Scenario(
+            "POST /artists/search",
+            "search_artists",
+            "POST",
+            lambda n: ("/artists/search", search_form(n)),
+        ),
+        Scenario(
+            "GET /artists/create",
+            "create_artist_form",
+            "GET",
+            lambda n: ("/artists/create", None),
+        ),
+        Scenario(
+            "POST /artists/create",
+            "create_artist_submission",
+            "POST",
+            lambda n: ("/artists/create", form_data(catalogue.artist(n))),
+        ),
+        Scenario(
+            "GET /artists/<id>/edit",
+            "edit_artist",
+            "GET",
+            lambda n: ("/artists/%d/edit" % fixtures.artist(n), None),
+        ),
+        Scenario(
+            "POST /artists/<id>/edit",
+            "edit_artist_submission",
+            "POST",
+            lambda n: (
+                "/artists/%d/edit" % fixtures.artist(n),
+                form_data(catalogue.artist(n)),
+            ),
+        ),
+        Scenario(
+            "DELETE /artists/<id>",
+            "delete_artist",
+            "DELETE",
+            lambda n: ("/artists/%d" % fixtures.new_artist(), None),
+        ),
+        Scenario("GET /shows", "shows", "GET", lambda n: ("/shows", None)),
+        Scenario(
+            "POST /shows/search",
+            "search_shows",
+            "POST",
+            lambda n: ("/shows/search", search_form(n)),
+        ),
+        Scenario(
+            "GET /shows/create",
+            "create_shows",
+            "GET",
+            lambda n: ("/shows/create", None),
+        ),
+        Scenario(
+            "POST /shows/create",
+            "create_show_submission",
+            "POST",
+            lambda n: ("/shows/create", fixtures.show_form(n)),
+        ),
+        Scenario(
+            "GET /shows/<id>/edit",
+            "edit_show",
+            "GET",
+            lambda n: ("/shows/%d/edit" % fixtures.show(n).id, None),
+        ),
+        Scenario(
+            "POST /shows/<id>/edit",
+            "edit_show_submission",
+            "POST",
+            lambda n: ("/shows/%d/edit" % fixtures.show(n).id, fixtures.show_form(n)),
+        ),
+        Scenario(
+            "DELETE /shows/<id>",
+            "delete_show",
+            "DELETE",
+            lambda n: ("/shows/%d" % fixtures.new_show(), None),
+        ),
+        Scenario(
+            "GET /cache/stats", "cache_stats", "GET", lambda n: ("/cache/stats", None)
+        ),
+        Scenario(
+            "GET /metrics", "prometheus_metrics", "GET", lambda n: ("/metrics", None)
+        ),
+        Scenario(
+            "GET /instrumentation",
+            "toggle_instrumentation",
+            "GET",
+            lambda n: ("/instrumentation", None),
+        ),
+    ]
+
+
+def uncovered_endpoints(app, scenario_list):
+    covered = {scenario.endpoint for scenario in scenario_list}
+    return sorted(
+        rule.endpoint
+        for rule in app.url_map.iter_rules()
+        if rule.endpoint != "static"
+        and "." not in rule.endpoint
+        and rule.endpoint not in covered
+    )
+
+
+def _request(client, scenario, number):
+    path, data = scenario.prepare(number)
+    return path, data, lambda: client.open(path, method=scenario.method, data=data)
+
+
+def measure(app, scenario, requests, warmup, memory_requests):
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def count_statement(*args):
+        statements.append(1)
+
+    client = app.test_client(use_cookies=False)
+    numbers = count()
+    for _ in range(warmup):
+        _request(client, scenario, next(numbers))[2]()
+
+    timings = []
+    query_counts = []
+    statuses = Counter()
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        for _ in range(requests):
+            path, data, send = _request(client, scenario, next(numbers))
+            del statements[:]
+            started = time.perf_counter()
+            response = send()
+            timings.append((time.perf_counter() - started) * 1000)
+            query_counts.append(len(statements))
+            statuses[response.status_code] += 1
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(memory_requests):
+            send = _request(client, scenario, next(numbers))[2]
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            send()
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "requests": requests,
+        "statuses": {str(code): n for code, n in sorted(statuses.items())},
+        "p50_ms": round(percentile(timings, 0.50), 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+        "p99_ms": round(percentile(timings, 0.99), 3),
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "queries": percentile(query_counts, 0.50),
+        "max_queries": max(query_counts),
+        "peak_memory_kib": round(max(peaks) / 1024, 1) if peaks else None,
+    }
+
+
+def run(app, fixtures, requests=50, warmup=3, memory_requests=3, only=None, log=print):
+    results = {}
+    for scenario in scenarios(fixtures):
+        if only and not any(pattern in scenario.name for pattern in only):
+            continue
+        result = measure(app, scenario, requests, warmup, memory_requests)
+        log(
+            "%-28s p50 %8.2f ms  p95 %8.2f ms  %3d queries  %8s KiB"
+            % (
+                scenario.name,
+                result["p50_ms"],
+                result["p95_ms"],
+                result["queries"],
+                result["peak_memory_kib"],
+            )
+        )
+        results[scenario.name] = result
+    return results
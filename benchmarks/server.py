@@ -0,0 +1,83 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Serves the app for `python -m benchmarks serve`, in a process of its own
+# per mode: "sync" with a fixed pool of worker threads, the way a threaded
+# WSGI server holds one thread per request, or "async" with async_server.py.
+# The database settings come from the environment of the parent. With
+# --latency-ms every SQL statement first waits that long, standing in for a
+# slow or distant database; the wait blocks a thread in sync mode and
+# yields to the other requests in async mode, as a psycopg2 query does.
+
+
+def simulate_latency(seconds):
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    def delay(conn, cursor, statement, parameters, context, executemany):
+        time.sleep(seconds)
+
+    event.listen(Engine, "before_cursor_execute", delay)
+
+
+def serve_sync(app, host, port, threads):
+    from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+    class ThreadPoolServer(BaseWSGIServer):
+        request_queue_size = 1024
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.executor = ThreadPoolExecutor(threads)
+
+        def process_request(self, request, client_address):
+            self.executor.submit(self.process_in_thread, request, client_address)
+
+        def process_in_thread(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    ThreadPoolServer(host, port, app, handler=QuietHandler).serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.server")
+    parser.add_argument("mode", choices=("sync", "async"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--max-connections", type=int)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--page-cache", choices=("null", "lru"), default="null")
+    args = parser.parse_args(argv)
+
+    if args.mode == "async":
+        import async_server
+
+        async_server.patch()
+    from app import app
+    from cache import page_cache
+
+    app.config["PAGE_CACHE_TYPE"] = args.page_cache
+    page_cache.init_app(app)
+    app.debug = False
+    if args.latency_ms:
+        simulate_latency(args.latency_ms / 1000)
+
+    if args.mode == "async":
+        async_server.serve(app, args.host, args.port, args.max_connections)
+    else:
+        serve_sync(app, args.host, args.port, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from itertools import count
+from benchmarks.runner import percentile
+
+# Throughput of the sync and async serving modes at high concurrency. Each
+# mode is served by benchmarks/server.py in a child process on a free port,
+# then `concurrency` clients, all in one asyncio loop so that the client
+# side is not what limits, request pages of the app back to back for
+# `duration` seconds. Requests that fail or take longer than `timeout`
+# count as errors.
+
+
+def paths(fixtures):
+    return [
+        lambda n: "/",
+        lambda n: "/venues",
+        lambda n: "/venues/%d" % fixtures.venue(n),
+        lambda n: "/artists/%d" % fixtures.artist(n),
+        lambda n: "/shows",
+    ]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def launch(mode, port, options):
+    command = [sys.executable, "-m", "benchmarks.server", mode, "--port", str(port)]
+    for name, value in options.items():
+        if value is not None:
+            command += ["--" + name.replace("_", "-"), str(value)]
+    process = subprocess.Popen(command, env=os.environ.copy())
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(
+                "The %s server exited with %d" % (mode, process.returncode)
+            )
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("The %s server did not start listening" % mode)
+
+
+async def fetch(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(("GET %s HTTP/1.0\r\nHost: localhost\r\n\r\n" % path).encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def drive(port, paths, concurrency, duration, timeout):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+    numbers = count()
+    latencies = []
+    statuses = Counter()
+
+    async def client():
+        while loop.time() < deadline:
+            number = next(numbers)
+            path = paths[number % len(paths)](number)
+            started = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(fetch(port, path), timeout)
+            except (OSError, ValueError, IndexError, asyncio.TimeoutError):
+                statuses["error"] += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            statuses[str(status)] += 1
+
+    started = loop.time()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    return loop.time() - started, latencies, statuses
+
+
+def measure(mode, fixtures, concurrency, duration, timeout, options):
+    port = free_port()
+    process = launch(mode, port, options)
+    try:
+        elapsed, latencies, statuses = asyncio.run(
+            drive(port, paths(fixtures), concurrency, duration, timeout)
+        )
+    finally:
+        process.terminate()
+        process.wait()
+    return {
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+
+def compare(
+    fixtures,
+    modes=("sync", "async"),
+    concurrency=200,
+    duration=10,
+    timeout=30,
+    **options
+):
+    return {
+        mode: measure(mode, fixtures, concurrency, duration, timeout, options)
+        for mode in modes
+    }
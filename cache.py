@@ -0,0 +1,199 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from flask import current_app, request, session
+from sqlalchemy import func
+from models import Show, db
+from metrics import PAGE_CACHE_REQUESTS
+
+# Full-page cache for the venue and artist detail pages. A page stays valid
+# until its entity's next upcoming show starts (the point where the
+# upcoming/past split changes) or until a write evicts it, whichever comes
+# first. The in-process LRU backend only sees evictions made by its own
+# worker, so deployments with several workers should use the shared
+# (Redis) backend.
+
+
+class LRUCache:
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    def __init__(self, url, prefix="fyyur:page:"):
+        # Optional dependency, only needed when PAGE_CACHE_TYPE is "redis".
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return None if value is None else value.decode("utf-8")
+
+    def set(self, key, value, timeout):
+        self._client.set(
+            self.prefix + key, value.encode("utf-8"), px=int(timeout * 1000)
+        )
+
+    def delete_many(self, *keys):
+        if keys:
+            self._client.delete(*[self.prefix + key for key in keys])
+
+    def clear(self):
+        keys = list(self._client.scan_iter(self.prefix + "*"))
+        if keys:
+            self._client.delete(*keys)
+
+
+class NullCache:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout):
+        pass
+
+    def delete_many(self, *keys):
+        pass
+
+    def clear(self):
+        pass
+
+
+class PageCache:
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cache_type = app.config.get("PAGE_CACHE_TYPE", "lru")
+        if cache_type == "lru":
+            self.backend = LRUCache(app.config.get("PAGE_CACHE_SIZE", 512))
+        elif cache_type == "redis":
+            self.backend = RedisCache(app.config["PAGE_CACHE_REDIS_URL"])
+        elif cache_type == "null":
+            self.backend = NullCache()
+        else:
+            raise ValueError("Unknown PAGE_CACHE_TYPE %r" % cache_type)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def delete_many(self, *keys):
+        self.backend.delete_many(*keys)
+
+    # Decorates a detail view taking `<kind>_id`; `foreign_key` is the Show
+    # column linking shows to that entity.
+    def cached(self, kind, foreign_key):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                # Pages carrying flashed messages are personal; render them.
+                if session.get("_flashes"):
+                    return view(**kwargs)
+                # Only the first page of each show section is cached; pages
+                # further along are rendered from their cursors.
+                if request.args:
+                    return view(**kwargs)
+
+                entity_id = kwargs[kind + "_id"]
+                key = page_key(kind, entity_id)
+                page = self.backend.get(key)
+                if page is not None:
+                    self.hits += 1
+                    PAGE_CACHE_REQUESTS.labels("hit").inc()
+                    return page
+
+                self.misses += 1
+                PAGE_CACHE_REQUESTS.labels("miss").inc()
+                now = datetime.now()
+                # The page is served to every visitor until it expires, so
+                # it is rendered from the primary: a replica may not have
+                # applied the write that evicted it yet.
+                use_replica = db.session.info.pop("use_replica", None)
+                try:
+                    page = view(**kwargs)
+                    if isinstance(page, str):
+                        timeout = current_app.config.get("PAGE_CACHE_TIMEOUT", 300)
+                        boundary = (
+                            db.session.query(func.min(Show.start_time))
+                            .filter(foreign_key == entity_id, Show.start_time >= now)
+                            .scalar()
+                        )
+                        if boundary is not None:
+                            timeout = min(timeout, (boundary - now).total_seconds())
+                        if timeout > 0:
+                            self.backend.set(key, page, timeout)
+                finally:
+                    if use_replica is not None:
+                        db.session.info["use_replica"] = use_replica
+                return page
+
+            return wrapper
+
+        return decorator
+
+
+page_cache = PageCache()
+
+
+def page_key(kind, entity_id):
+    return "%s:%s" % (kind, entity_id)
+
+
+# Pages that show a venue: its own page and the pages of the artists that
+# play there, whose show tiles carry the venue's name and image.
+def venue_pages(venue_id):
+    artist_ids = db.session.query(Show.artist_id).filter(Show.venue_id == venue_id)
+    return [page_key("venue", venue_id)] + [
+        page_key("artist", artist_id) for artist_id, in artist_ids.distinct()
+    ]
+
+
+def artist_pages(artist_id):
+    venue_ids = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id)
+    return [page_key("artist", artist_id)] + [
+        page_key("venue", venue_id) for venue_id, in venue_ids.distinct()
+    ]
+
+
+def show_pages(*shows):
+    keys = []
+    for venue_id, artist_id in shows:
+        keys += [page_key("venue", venue_id), page_key("artist", artist_id)]
+    return keys
@@ -0,0 +1,179 @@
+from collections import defaultdict
+from datetime import datetime
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, bindparam, event, func, inspect, select
+from models import Venue, Artist, Show, CounterState, db
+
+# Venue and Artist carry denormalized upcoming/past show counts so listing
+# and search pages can read them with the entity row. Show writes adjust
+# them in the same transaction; `flask roll-show-counters` (run from cron)
+# moves shows that have started since the last roll from upcoming to past,
+# and `flask reconcile-show-counters` rebuilds everything from the Show table.
+
+COUNTED = ((Venue, "venue_id"), (Artist, "artist_id"))
+
+
+def _boundary(connection):
+    # FOR SHARE makes a write wait for a roll in progress, so the show is
+    # either moved by the roll or classified against the new boundary.
+    rolled_at = connection.execute(
+        select([CounterState.rolled_at])
+        .where(CounterState.id == 1)
+        .with_for_update(read=True)
+    ).scalar()
+    return rolled_at or datetime.now()
+
+
+def _adjust(connection, values, delta):
+    upcoming = values["start_time"] >= _boundary(connection)
+    for model, key in COUNTED:
+        column = model.upcoming_shows_count if upcoming else model.past_shows_count
+        connection.execute(
+            model.__table__.update()
+            .where(model.id == values[key])
+            .values({column.key: column + delta})
+        )
+
+
+def _committed(target, key):
+    history = inspect(target).attrs[key].history
+    return (history.deleted or history.unchanged or history.added)[0]
+
+
+def _current(target):
+    return {
+        key: getattr(target, key) for key in ("start_time", "venue_id", "artist_id")
+    }
+
+
+@event.listens_for(Show, "after_insert")
+def count_inserted_show(mapper, connection, target):
+    _adjust(connection, _current(target), 1)
+
+
+@event.listens_for(Show, "after_update")
+def count_updated_show(mapper, connection, target):
+    old = {key: _committed(target, key) for key in _current(target)}
+    new = _current(target)
+    if old != new:
+        _adjust(connection, old, -1)
+        _adjust(connection, new, 1)
+
+
+@event.listens_for(Show, "after_delete")
+def count_deleted_show(mapper, connection, target):
+    _adjust(connection, {key: _committed(target, key) for key in _current(target)}, -1)
+
+
+# The database deletes the shows of a deleted venue or artist (ON DELETE
+# CASCADE) without mapper events, so the counters of the entities on the
+# other side of those shows are lowered beforehand, with one UPDATE.
+@event.listens_for(Venue, "before_delete")
+@event.listens_for(Artist, "before_delete")
+def uncount_cascaded_shows(mapper, connection, target):
+    deleted_key = getattr(Show, dict(COUNTED)[mapper.class_])
+    boundary = _boundary(connection)
+    for model, key in COUNTED:
+        if model is mapper.class_:
+            continue
+        foreign_key = getattr(Show, key)
+        count = select([func.count()]).where(
+            and_(deleted_key == target.id, foreign_key == model.id)
+        )
+        connection.execute(
+            model.__table__.update()
+            .where(model.id.in_(select([foreign_key]).where(deleted_key == target.id)))
+            .values(
+                upcoming_shows_count=model.upcoming_shows_count
+                - count.where(Show.start_time >= boundary).as_scalar(),
+                past_shows_count=model.past_shows_count
+                - count.where(Show.start_time < boundary).as_scalar(),
+            )
+        )
+
+
+# Counts shows written or deleted with Core statements (bulk imports and
+# batched deletes), which bypass the mapper events, with one executemany
+# UPDATE per counted table.
+def count_imported_shows(connection, shows, delta=1):
+    boundary = _boundary(connection)
+    for model, key in COUNTED:
+        deltas = defaultdict(lambda: [0, 0])
+        for show in shows:
+            deltas[show[key]][show["start_time"] < boundary] += delta
+        connection.execute(
+            model.__table__.update()
+            .where(model.id == bindparam("entity_id"))
+            .values(
+                upcoming_shows_count=model.upcoming_shows_count + bindparam("upcoming"),
+                past_shows_count=model.past_shows_count + bindparam("past"),
+            ),
+            [
+                {"entity_id": entity_id, "upcoming": upcoming, "past": past}
+                for entity_id, (upcoming, past) in deltas.items()
+            ],
+        )
+
+
+def roll_show_counters(now=None):
+    now = now or datetime.now()
+    state = db.session.query(CounterState).with_for_update().get(1)
+    if state is None:
+        return reconcile_show_counters(now)
+    if now <= state.rolled_at:
+        return state.rolled_at
+
+    started = and_(Show.start_time >= state.rolled_at, Show.start_time < now)
+    for model, key in COUNTED:
+        foreign_key = getattr(Show, key)
+        moved = (
+            select([func.count()])
+            .where(and_(foreign_key == model.id, started))
+            .as_scalar()
+        )
+        db.session.execute(
+            model.__table__.update()
+            .where(model.id.in_(select([foreign_key]).where(started)))
+            .values(
+                upcoming_shows_count=model.upcoming_shows_count - moved,
+                past_shows_count=model.past_shows_count + moved,
+            )
+        )
+    state.rolled_at = now
+    db.session.commit()
+    return now
+
+
+def reconcile_show_counters(now=None):
+    now = now or datetime.now()
+    state = db.session.query(CounterState).with_for_update().get(1)
+    for model, key in COUNTED:
+        foreign_key = getattr(Show, key)
+        count = select([func.count()]).where(foreign_key == model.id)
+        db.session.execute(
+            model.__table__.update().values(
+                upcoming_shows_count=count.where(Show.start_time >= now).as_scalar(),
+                past_shows_count=count.where(Show.start_time < now).as_scalar(),
+            )
+        )
+    if state is None:
+        db.session.add(CounterState(id=1, rolled_at=now))
+    else:
+        state.rolled_at = now
+    db.session.commit()
+    return now
+
+
+@click.command("roll-show-counters")
+@with_appcontext
+def roll_show_counters_command():
+    """Move shows that have started from upcoming to past counts."""
+    click.echo("Show counters rolled to %s" % roll_show_counters())
+
+
+@click.command("reconcile-show-counters")
+@with_appcontext
+def reconcile_show_counters_command():
+    """Rebuild every venue and artist show counter from the Show table."""
+    click.echo("Show counters rebuilt as of %s" % reconcile_show_counters())
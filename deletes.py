@@ -0,0 +1,85 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from cache import page_cache
+from counters import COUNTED, count_imported_shows
+from models import Show, db
+
+# Venue and artist deletes. Show.venue_id and Show.artist_id are ON DELETE
+# CASCADE and the `shows` relationships passive, so deleting an entity is a
+# single DELETE statement; counters.py lowers the show counters of the
+# entities on the other side of its shows in one UPDATE beforehand.
+#
+# That statement still deletes and locks every show of the entity in one
+# transaction. With DELETE_IN_BACKGROUND, entities with more than
+# DELETE_BATCH_THRESHOLD shows are deleted by a background thread instead:
+# their shows go DELETE_BATCH_SIZE at a time, each batch in a short
+# transaction of its own, then the entity. The entity stays visible, with
+# fewer and fewer shows, until the last batch.
+
+
+def delete_in_batches(model, entity_id, batch_size):
+    foreign_key = getattr(Show, dict(COUNTED)[model])
+    while True:
+        shows = (
+            db.session.query(Show.id, Show.venue_id, Show.artist_id, Show.start_time)
+            .filter(foreign_key == entity_id)
+            .order_by(Show.id)
+            .limit(batch_size)
+            .with_for_update()
+            .all()
+        )
+        if not shows:
+            break
+        db.session.execute(
+            Show.__table__.delete().where(Show.id.in_([show.id for show in shows]))
+        )
+        count_imported_shows(
+            db.session.connection(), [show._asdict() for show in shows], -1
+        )
+        db.session.commit()
+
+    entity = db.session.query(model).get(entity_id)
+    if entity is not None:
+        db.session.delete(entity)
+        db.session.commit()
+
+
+class BackgroundDeletes:
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        if app.config.get("DELETE_IN_BACKGROUND"):
+            self.executor = ThreadPoolExecutor(1, thread_name_prefix="deletes")
+
+    # Hands the delete of a venue or artist over to the background thread
+    # when it has too many shows to go in one statement. `pages` are the
+    # cached pages to evict once it is gone. Returns whether it did.
+    def defer(self, entity, pages):
+        if self.executor is None:
+            return False
+        shows = entity.upcoming_shows_count + entity.past_shows_count
+        if shows <= self.app.config.get("DELETE_BATCH_THRESHOLD", 10000):
+            return False
+        self.executor.submit(self._delete, type(entity), entity.id, pages)
+        return True
+
+    def _delete(self, model, entity_id, pages):
+        with self.app.app_context():
+            try:
+                delete_in_batches(
+                    model, entity_id, self.app.config.get("DELETE_BATCH_SIZE", 1000)
+                )
+            except Exception:
+                db.session.rollback()
+                print(sys.exc_info())
+            finally:
+                db.session.remove()
+                page_cache.delete_many(*pages)
+
+
+background_deletes = BackgroundDeletes()
@@ -0,0 +1,212 @@
+import select
+import sys
+import threading
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.pool import NullPool
+from cache import LRUCache
+from models import Venue, Artist, Show, db
+from replicas import RoutingSession
+
+# Read-through cache of Venue, Artist and Show rows by id, kept by every
+# worker. A lookup returns an instance attached to the request's session,
+# built from the cached column values without a query, so views can edit
+# or delete it as if they had loaded it.
+#
+# On Postgres, triggers (migration c58f0e3a9d12) send "<Model>:<id>" on the
+# entity_changes channel for every updated or deleted row, whatever wrote
+# it, and Postgres delivers the notifications when the transaction commits.
+# Each worker LISTENs on its own connection and evicts the rows named. That
+# connection is to ENTITY_CACHE_LISTEN_URI when set (LISTEN needs a session
+# of its own on the server, which a transaction pooler such as PgBouncer
+# does not keep); behind DATABASE_PGBOUNCER without it, the cache is off. A
+# worker that is not listening (before it connects, or after losing the
+# connection, when it may have missed notifications) reads through to the
+# database and empties the cache once listening again. Writes made through
+# the worker's own session are evicted at flush time, on every database.
+#
+# A read racing with a change could store the row as it was before the
+# change after its notification has been handled. Rows are only stored when
+# no eviction happened while they were loaded, and never by a session that
+# has written, whose rows may yet be rolled back.
+
+CHANNEL = "entity_changes"
+MODELS = {model.__name__: model for model in (Venue, Artist, Show)}
+
+
+def entity_key(model, entity_id):
+    return "%s:%s" % (model.__name__, entity_id)
+
+
+class EntityCache:
+    def __init__(self, app=None):
+        self.backend = None
+        self.timeout = 600
+        self.generation = 0
+        self.listening = False
+        self.needs_listener = False
+        self._listener = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        size = app.config.get("ENTITY_CACHE_SIZE", 2048)
+        if not size:
+            return
+        url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+        # get_backend_name() is "postgres" for postgres:// URLs.
+        postgres = url.get_dialect().name == "postgresql"
+        listen_uri = app.config.get("ENTITY_CACHE_LISTEN_URI")
+        # Notifications would never be heard through the pooler.
+        if postgres and not listen_uri and app.config.get("DATABASE_PGBOUNCER"):
+            return
+        self.backend = LRUCache(size)
+        self.timeout = app.config.get("ENTITY_CACHE_TIMEOUT", 600)
+        if postgres:
+            self.needs_listener = True
+            self.url = make_url(listen_uri) if listen_uri else url
+            self.retry_interval = app.config.get("ENTITY_CACHE_RETRY_INTERVAL", 5)
+            # Started in the worker, not in a master process that forks.
+            app.before_request(self._start_listener)
+
+    # The instance of `model` with this id, attached to the session, or
+    # None when there is no such row.
+    def get(self, model, entity_id):
+        if entity_id is None:
+            return None
+        if self.backend is None or (self.needs_listener and not self.listening):
+            return model.query.get(entity_id)
+
+        session = db.session()
+        key = entity_key(model, entity_id)
+        values = self.backend.get(key)
+        if values is not None:
+            instance = model(**{name: _copy(value) for name, value in values.items()})
+            make_transient_to_detached(instance)
+            return session.merge(instance, load=False)
+
+        generation = self.generation
+        # A replica may not have applied the change whose notification
+        # emptied this slot yet; misses are read from the primary.
+        use_replica = session.info.pop("use_replica", None)
+        try:
+            instance = model.query.get(entity_id)
+        finally:
+            if use_replica is not None:
+                session.info["use_replica"] = use_replica
+        if (
+            instance is not None
+            and not session.info.get("wrote")
+            and generation == self.generation
+        ):
+            values = {
+                column.key: _copy(getattr(instance, column.key))
+                for column in model.__mapper__.column_attrs
+            }
+            self.backend.set(key, values, self.timeout)
+        return instance
+
+    def evict(self, *keys):
+        if self.backend is None:
+            return
+        with self._lock:
+            self.generation += 1
+        self.backend.delete_many(*keys)
+
+    def clear(self):
+        if self.backend is None:
+            return
+        with self._lock:
+            self.generation += 1
+        self.backend.clear()
+
+    def _start_listener(self):
+        if self._listener is None:
+            with self._lock:
+                if self._listener is None:
+                    self._listener = threading.Thread(
+                        target=self._listen, name="entity-cache", daemon=True
+                    )
+                    self._listener.start()
+
+    def _listen(self):
+        engine = create_engine(self.url, poolclass=NullPool)
+        while True:
+            try:
+                connection = engine.raw_connection()
+                try:
+                    self._receive(connection.connection)
+                finally:
+                    self.listening = False
+                    connection.close()
+            except Exception:
+                print(sys.exc_info())
+            time.sleep(self.retry_interval)
+
+    def _receive(self, connection):
+        connection.autocommit = True
+        cursor = connection.cursor()
+        cursor.execute("LISTEN %s" % CHANNEL)
+        # Changes made while nobody listened were not heard.
+        self.clear()
+        self.listening = True
+        while True:
+            if select.select([connection], [], [], 60) == ([], [], []):
+                cursor.execute("SELECT 1")
+                continue
+            connection.poll()
+            keys = [notify.payload for notify in connection.notifies]
+            del connection.notifies[:]
+            if keys:
+                self.evict(*keys)
+
+
+def _copy(value):
+    return list(value) if isinstance(value, list) else value
+
+
+entity_cache = EntityCache()
+
+
+# Rows written through a session, including the venue and artist of a
+# written show (their counters change with it). Shows deleted along with a
+# venue or artist are not known one by one; the whole cache is emptied.
+# The rows are evicted again after the commit, as another session may have
+# stored them as they were before it in between.
+@event.listens_for(RoutingSession, "after_flush")
+def evict_written_entities(session, flush_context):
+    keys = session.info.setdefault("entity_cache_evict", set())
+    for instance in list(session.dirty) + list(session.deleted) + list(session.new):
+        model = type(instance)
+        if model.__name__ not in MODELS or instance.id is None:
+            continue
+        if model is not Show and instance in session.deleted:
+            session.info["entity_cache_clear"] = True
+        keys.add(entity_key(model, instance.id))
+        if model is Show:
+            for key, related in (("venue_id", Venue), ("artist_id", Artist)):
+                history = getattr(type(instance), key).impl.get_history(
+                    instance._sa_instance_state, instance.__dict__
+                )
+                for value in history.sum() or [getattr(instance, key)]:
+                    keys.add(entity_key(related, value))
+    _evict_for(session, keep=True)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+@event.listens_for(RoutingSession, "after_soft_rollback")
+def evict_committed_entities(session, *args):
+    _evict_for(session, keep=False)
+
+
+def _evict_for(session, keep):
+    if session.info.get("entity_cache_clear"):
+        entity_cache.clear()
+    elif session.info.get("entity_cache_evict"):
+        entity_cache.evict(*session.info["entity_cache_evict"])
+    if not keep:
+        session.info.pop("entity_cache_clear", None)
+        session.info.pop("entity_cache_evict", None)
@@ -0,0 +1,252 @@
+import csv
+import gzip
+import io
+import json
+import os
+from datetime import datetime, timedelta
+from itertools import islice
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from models import Venue, Artist, Show, db
+
+# `flask export [venues artists shows]` dumps tables for analytics. Rows are
+# read from a server-side cursor and written batch by batch, so memory use
+# does not depend on table size. --since-last-run only exports rows whose
+# updated_at is newer than the high-water mark of the previous run, kept in
+# OUTPUT/.export-state.json. Deleted rows are not reported.
+#
+# updated_at is the start time of the writing transaction, so a row can
+# commit after an export with a timestamp at or below its mark. Each run
+# therefore re-reads the EXPORT_SINCE_OVERLAP seconds below the mark and
+# skips the rows it finds there unchanged since the previous run, whose
+# ids and timestamps are kept in the state file. Transactions open for
+# longer than the overlap can still be missed.
+
+MODELS = {"venues": Venue, "artists": Artist, "shows": Show}
+STATE_FILE = ".export-state.json"
+
+
+def _text(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return ",".join(value)
+    return value
+
+
+class CSVWriter:
+    extension = "csv"
+
+    def __init__(self, output, keys, model):
+        self._text = io.TextIOWrapper(output, encoding="utf-8", newline="")
+        self._writer = csv.writer(self._text)
+        self._writer.writerow(keys)
+
+    def write(self, rows):
+        self._writer.writerows([_text(value) for value in row] for row in rows)
+
+    def close(self):
+        self._text.flush()
+        self._text.detach()
+
+
+class JSONLWriter:
+    extension = "jsonl"
+
+    def __init__(self, output, keys, model):
+        self._output = output
+        self._keys = keys
+
+    def write(self, rows):
+        lines = [
+            json.dumps(dict(zip(self._keys, row)), default=_text) + "\n" for row in rows
+        ]
+        self._output.write("".join(lines).encode("utf-8"))
+
+    def close(self):
+        pass
+
+
+# Parquet through pyarrow, an optional dependency only needed for this
+# format. Each batch becomes one row group.
+class ParquetWriter:
+    extension = "parquet"
+
+    def __init__(self, output, keys, model):
+        import pyarrow
+        import pyarrow.parquet
+
+        self._pyarrow = pyarrow
+        self._keys = keys
+        columns = model.__table__.columns
+        self._schema = pyarrow.schema(
+            [(key, self._arrow_type(columns[key].type)) for key in keys]
+        )
+        self._writer = pyarrow.parquet.ParquetWriter(
+            output, self._schema, compression="zstd"
+        )
+
+    def _arrow_type(self, column_type):
+        pyarrow = self._pyarrow
+        python_type = column_type.python_type
+        if python_type is list:
+            return pyarrow.list_(pyarrow.string())
+        return {
+            int: pyarrow.int64(),
+            bool: pyarrow.bool_(),
+            datetime: pyarrow.timestamp("us"),
+        }.get(python_type, pyarrow.string())
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        self._writer.write_table(
+            self._pyarrow.Table.from_arrays(
+                [self._pyarrow.array(column) for column in columns],
+                schema=self._schema,
+            )
+        )
+
+    def close(self):
+        self._writer.close()
+
+
+WRITERS = {"csv": CSVWriter, "jsonl": JSONLWriter, "parquet": ParquetWriter}
+
+
+def _load_state(directory):
+    path = os.path.join(directory, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as state:
+        return json.load(state)
+
+
+def _save_state(directory, state):
+    path = os.path.join(directory, STATE_FILE)
+    with open(path + ".tmp", "w") as output:
+        json.dump(state, output, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+# `exported` maps the ids of the rows exported by the previous run within
+# the overlap below `since` to their updated_at. Returns the number of rows
+# written, the new high-water mark and the same map for the next run.
+def export_table(
+    model,
+    path,
+    file_format,
+    compress,
+    batch_size,
+    since=None,
+    exported=None,
+    overlap=timedelta(0),
+):
+    columns = list(model.__table__.columns)
+    keys = [column.key for column in columns]
+    query = db.session.query(*[getattr(model, key) for key in keys])
+    if since is None:
+        query = query.order_by(model.id)
+    else:
+        query = query.filter(model.updated_at >= since - overlap).order_by(
+            model.updated_at, model.id
+        )
+    exported = exported or {}
+    rows = iter(query.execution_options(stream_results=True).yield_per(batch_size))
+
+    if compress and file_format != "parquet":
+        output = gzip.open(path, "wb")
+    else:
+        output = open(path, "wb")
+    writer = WRITERS[file_format](output, keys, model)
+
+    count = 0
+    high_water = since
+    recent = {}
+    try:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            changed = [
+                row
+                for row in batch
+                if exported.get(str(row.id)) != row.updated_at.isoformat()
+            ]
+            if changed:
+                writer.write(changed)
+                count += len(changed)
+            latest = max(row.updated_at for row in batch)
+            high_water = latest if high_water is None else max(high_water, latest)
+            recent.update((str(row.id), row.updated_at.isoformat()) for row in batch)
+            recent = {
+                key: updated_at
+                for key, updated_at in recent.items()
+                if datetime.fromisoformat(updated_at) >= high_water - overlap
+            }
+    finally:
+        writer.close()
+        output.close()
+    return count, high_water, recent
+
+
+@click.command("export")
+@click.argument("kinds", nargs=-1, type=click.Choice(sorted(MODELS)))
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(sorted(WRITERS)),
+    default="csv",
+    show_default=True,
+)
+@click.option(
+    "--output",
+    "directory",
+    type=click.Path(file_okay=False),
+    default="exports",
+    show_default=True,
+)
+@click.option("--compress/--no-compress", default=True, help="gzip CSV and JSONL.")
+@click.option("--batch-size", default=5000, show_default=True)
+@click.option("--since-last-run", is_flag=True, help="Only rows changed since then.")
+@with_appcontext
+def export_command(kinds, file_format, directory, compress, batch_size, since_last_run):
+    """Export venues, artists and shows to CSV, JSONL or Parquet files."""
+    if file_format == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise click.ClickException("--format parquet needs pyarrow installed")
+    os.makedirs(directory, exist_ok=True)
+    state = _load_state(directory)
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    overlap = timedelta(seconds=current_app.config.get("EXPORT_SINCE_OVERLAP", 600))
+
+    for kind in kinds or sorted(MODELS):
+        since, exported = None, {}
+        if since_last_run and kind in state:
+            mark = state[kind]
+            # State files of earlier versions hold the mark alone.
+            if isinstance(mark, str):
+                mark = {"since": mark, "exported": {}}
+            since, exported = datetime.fromisoformat(mark["since"]), mark["exported"]
+        extension = WRITERS[file_format].extension
+        if compress and file_format != "parquet":
+            extension += ".gz"
+        path = os.path.join(directory, "%s-%s.%s" % (kind, stamp, extension))
+
+        count, high_water, recent = export_table(
+            MODELS[kind],
+            path,
+            file_format,
+            compress,
+            batch_size,
+            since,
+            exported,
+            overlap,
+        )
+        if high_water is not None:
+            state[kind] = {"since": high_water.isoformat(), "exported": recent}
+        click.echo("Exported %d %s to %s" % (count, kind, path))
+
+    _save_state(directory, state)
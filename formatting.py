@@ -0,0 +1,35 @@
+from functools import lru_cache
+import babel.dates
+import dateutil.parser
+from babel import Locale
+
+# Date formatting for the templates (the `datetime` filter). Views pass
+# datetime objects; strings are still parsed for other callers. Patterns
+# are parsed and locales loaded once per (pattern, locale) instead of on
+# every call, which is what babel.dates.format_datetime does.
+
+# Named formats of the `datetime` filter, as babel patterns.
+FORMATS = {
+    "full": "EEEE MMMM, d, y 'at' h:mma",
+    "medium": "EE MM, dd, y h:mma",
+}
+BABEL_FORMATS = ("full", "long", "medium", "short")
+
+
+@lru_cache(maxsize=64)
+def compiled_pattern(pattern, locale):
+    return babel.dates.parse_pattern(pattern), Locale.parse(locale)
+
+
+def format_datetime(value, format="medium", locale=None):
+    if isinstance(value, str):
+        value = dateutil.parser.parse(value)
+    pattern = FORMATS.get(format, format)
+    locale = locale or babel.dates.LC_TIME
+    if pattern in BABEL_FORMATS:
+        return babel.dates.format_datetime(value, pattern, locale=locale)
+    # Like babel, naive datetimes are taken to be UTC.
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=babel.dates.UTC)
+    compiled, locale = compiled_pattern(pattern, locale)
+    return compiled.apply(value, locale)
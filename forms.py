@@ -149,10 +149,12 @@ class ArtistForm(FlaskForm):
 class ShowForm(FlaskForm):
     artist_id = IntegerField("artist_id", validators=[DataRequired()])
     venue_id = IntegerField("venue_id", validators=[DataRequired()])
+    # InputRequired: a start time left out of the submitted data (an import
+    # row or an API payload) must not fall back to the default.
     start_time = DateTimeField(
         "start_time",
-        validators=[DataRequired(message="Please enter a valid date and time")],
-        default=datetime.today(),
+        validators=[InputRequired(message="Please enter a valid date and time")],
+        default=datetime.today,
     )
 
 
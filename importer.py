@@ -0,0 +1,245 @@
+import csv
+import io
+import json
+import os
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+import click
+from flask.cli import with_appcontext
+from werkzeug.datastructures import MultiDict
+from forms import VenueForm, ShowForm, ArtistForm
+from models import Venue, Artist, Show, db
+from cache import page_cache, show_pages
+from counters import count_imported_shows
+
+# `flask import venues|artists|shows FILE` loads a CSV or JSONL catalogue.
+# Rows are validated with the same forms as the create pages, then written
+# in batches, one transaction per batch: with COPY on Postgres and an
+# executemany INSERT elsewhere. Each committed batch advances a checkpoint
+# next to the input file so an interrupted import can be resumed with
+# --resume; rejected rows are appended to a JSONL file with their errors.
+
+MODELS = {
+    "venues": (Venue, VenueForm),
+    "artists": (Artist, ArtistForm),
+    "shows": (Show, ShowForm),
+}
+
+BOOLEAN_FIELDS = ("seeking_talent", "seeking_venue")
+TRUE_VALUES = ("1", "true", "t", "yes", "y")
+
+
+def read_rows(path):
+    with open(path, newline="") as source:
+        if path.endswith(".jsonl") or path.endswith(".ndjson"):
+            for line, text in enumerate(source, 1):
+                if text.strip():
+                    yield line, json.loads(text)
+        else:
+            reader = csv.DictReader(source)
+            for row in reader:
+                yield reader.line_num, row
+
+
+# Rows go through the forms as if they had been typed in, so JSONL numbers
+# and booleans become strings like form fields.
+def normalize(row):
+    values = {}
+    for key, value in row.items():
+        if value in (None, ""):
+            continue
+        if isinstance(value, list):
+            values[key] = [str(item) for item in value]
+        else:
+            values[key] = value if isinstance(value, str) else str(value)
+    genres = values.get("genres")
+    if isinstance(genres, str):
+        values["genres"] = [genre.strip() for genre in genres.split(",")]
+    for key in BOOLEAN_FIELDS:
+        if key in values:
+            value = str(values[key]).strip().lower()
+            values[key] = "y" if value in TRUE_VALUES else ""
+    start_time = values.get("start_time")
+    if isinstance(start_time, str) and "T" in start_time:
+        try:
+            values["start_time"] = datetime.fromisoformat(
+                start_time.rstrip("Z")
+            ).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+    return values
+
+
+# Fills in artist_id/venue_id from artist_name/venue_name with one query
+# per batch and entity; names that match several rows are ambiguous.
+def resolve_names(batch, rejects):
+    for model, key in ((Artist, "artist"), (Venue, "venue")):
+        names = {
+            values[key + "_name"]
+            for _, values in batch
+            if key + "_id" not in values and key + "_name" in values
+        }
+        if not names:
+            continue
+        ids = defaultdict(list)
+        for name, entity_id in db.session.query(model.name, model.id).filter(
+            model.name.in_(names)
+        ):
+            ids[name].append(entity_id)
+        resolved = []
+        for line, values in batch:
+            name = values.get(key + "_name")
+            if key + "_id" in values or name is None:
+                resolved.append((line, values))
+            elif len(ids.get(name, [])) == 1:
+                values[key + "_id"] = ids[name][0]
+                resolved.append((line, values))
+            else:
+                problem = "is ambiguous" if ids.get(name) else "does not exist"
+                rejects.append((line, values, {key + "_name": [problem]}))
+        batch[:] = resolved
+
+
+def check_show_references(rows, rejects):
+    existing = {}
+    for model, key in ((Artist, "artist_id"), (Venue, "venue_id")):
+        ids = {values[key] for _, values in rows}
+        existing[key] = {
+            entity_id
+            for entity_id, in db.session.query(model.id).filter(model.id.in_(ids))
+        }
+    checked = []
+    for line, values in rows:
+        errors = {
+            key: ["This %s does not exist" % key[:-3]]
+            for key in ("artist_id", "venue_id")
+            if values[key] not in existing[key]
+        }
+        if errors:
+            rejects.append((line, values, errors))
+        else:
+            checked.append((line, values))
+    return checked
+
+
+def validate(model, form_class, batch, rejects):
+    columns = model.__table__.columns
+    rows = []
+    for line, values in batch:
+        form = form_class(formdata=MultiDict(values))
+        if form.validate():
+            rows.append(
+                (
+                    line,
+                    {key: value for key, value in form.data.items() if key in columns},
+                )
+            )
+        else:
+            rejects.append((line, values, form.errors))
+    return rows
+
+
+def _copy_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat(" ")
+    if isinstance(value, list):
+        return "{%s}" % ",".join(
+            '"%s"' % item.replace("\\", "\\\\").replace('"', '\\"') for item in value
+        )
+    return value
+
+
+def insert_rows(model, rows):
+    connection = db.session.connection()
+    if connection.dialect.name != "postgresql":
+        connection.execute(model.__table__.insert(), rows)
+        return
+
+    keys = [key for key in rows[0] if key != "id"]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(row[key]) for key in keys])
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    cursor.copy_expert(
+        "COPY \"%s\" (%s) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+        % (model.__tablename__, ", ".join(keys)),
+        buffer,
+    )
+
+
+def _write_rejects(path, rejects):
+    if not rejects:
+        return
+    with open(path, "a") as output:
+        for line, values, errors in rejects:
+            output.write(
+                json.dumps({"line": line, "row": values, "errors": errors}, default=str)
+                + "\n"
+            )
+
+
+@click.command("import")
+@click.argument("kind", type=click.Choice(sorted(MODELS)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--rejects", "rejects_path", help="Defaults to PATH.rejects.jsonl.")
+@click.option("--resume", is_flag=True, help="Skip rows committed by an earlier run.")
+@with_appcontext
+def import_command(kind, path, batch_size, rejects_path, resume):
+    """Bulk import venues, artists or shows from a CSV or JSONL file."""
+    model, form_class = MODELS[kind]
+    rejects_path = rejects_path or path + ".rejects.jsonl"
+    checkpoint_path = path + ".checkpoint"
+
+    done = 0
+    if resume and os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as checkpoint:
+            done = int(checkpoint.read().strip() or 0)
+        click.echo("Resuming after line %d" % done)
+    elif os.path.exists(rejects_path):
+        os.remove(rejects_path)
+
+    rows = ((line, row) for line, row in read_rows(path) if line > done)
+    imported = rejected = 0
+    while True:
+        batch = [(line, normalize(row)) for line, row in islice(rows, batch_size)]
+        if not batch:
+            break
+        last_line = batch[-1][0]
+        rejects = []
+        if model is Show:
+            resolve_names(batch, rejects)
+        valid = validate(model, form_class, batch, rejects)
+        if model is Show and valid:
+            valid = check_show_references(valid, rejects)
+
+        values = [row for _, row in valid]
+        if values:
+            insert_rows(model, values)
+            if model is Show:
+                count_imported_shows(db.session.connection(), values)
+        db.session.commit()
+        if model is Show:
+            page_cache.delete_many(
+                *show_pages(*{(row["venue_id"], row["artist_id"]) for row in values})
+            )
+
+        with open(checkpoint_path, "w") as checkpoint:
+            checkpoint.write(str(last_line))
+        _write_rejects(rejects_path, rejects)
+        imported += len(values)
+        rejected += len(rejects)
+        click.echo(
+            "line %d: %d imported, %d rejected" % (last_line, imported, rejected)
+        )
+
+    click.echo("Imported %d %s, rejected %d" % (imported, kind, rejected))
+    if rejected:
+        click.echo("Rejected rows were written to %s" % rejects_path)
@@ -0,0 +1,235 @@
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from flask import g, has_app_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Per-request instrumentation: wall time, time spent in SQL statements, the
+# number of statements and the rows the driver reported for them (cursor
+# rowcount; SQLite does not report it for SELECTs) and template rendering
+# time. The figures go out in a Server-Timing header and are appended, in
+# batches, to a JSONL request log. Disabling it removes the engine listeners
+# and leaves one attribute check per request.
+#
+# The runtime switch is a file (INSTRUMENTATION_SWITCH_PATH) holding "on" or
+# "off", so that switching it reaches every worker: each one re-reads it at
+# most once a second.
+
+
+class RequestStats:
+    __slots__ = ("started", "db", "queries", "rows", "template")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.template = 0.0
+
+
+def current_stats():
+    if has_app_context():
+        return g.get("request_stats")
+    return None
+
+
+# The start time is kept on the statement's execution context, which goes
+# away with it when the statement fails. The context is None for the few
+# statements the dialect runs on its own (e.g. when connecting); they are
+# not timed.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats = current_stats()
+    if stats is None:
+        return
+    stats.db += elapsed
+    stats.queries += 1
+    if cursor.rowcount > 0:
+        stats.rows += cursor.rowcount
+
+
+class TimedTemplate(Template):
+    def render(self, *args, **kwargs):
+        stats = current_stats() if instrumentation.enabled else None
+        if stats is None:
+            return super().render(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            stats.template += time.perf_counter() - started
+
+    # Streamed templates (see streaming.py) are timed chunk by chunk.
+    def generate(self, *args, **kwargs):
+        stats = current_stats() if instrumentation.enabled else None
+        chunks = super().generate(*args, **kwargs)
+        if stats is None:
+            yield from chunks
+            return
+        while True:
+            started = time.perf_counter()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                stats.template += time.perf_counter() - started
+            yield chunk
+
+
+class RequestLog:
+    def __init__(self, path, batch_size=100, flush_interval=5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._entries = []
+        self._flushed = time.monotonic()
+        self._lock = threading.Lock()
+
+    def append(self, entry):
+        with self._lock:
+            self._entries.append(entry)
+            if (
+                len(self._entries) < self.batch_size
+                and time.monotonic() - self._flushed < self.flush_interval
+            ):
+                return
+            entries, self._entries = self._entries, []
+            self._flushed = time.monotonic()
+        self._write(entries)
+
+    def flush(self):
+        with self._lock:
+            entries, self._entries = self._entries, []
+            self._flushed = time.monotonic()
+        self._write(entries)
+
+    def _write(self, entries):
+        if entries:
+            lines = "".join(json.dumps(entry) + "\n" for entry in entries)
+            with open(self.path, "a") as output:
+                output.write(lines)
+
+
+class Instrumentation:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.log = None
+        self.switch_path = None
+        self._switch_checked = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        path = app.config.get("REQUEST_LOG_PATH")
+        if path:
+            self.log = RequestLog(
+                path,
+                app.config.get("REQUEST_LOG_BATCH_SIZE", 100),
+                app.config.get("REQUEST_LOG_FLUSH_INTERVAL", 5),
+            )
+            atexit.register(self.log.flush)
+        self.switch_path = app.config.get("INSTRUMENTATION_SWITCH_PATH")
+        app.jinja_env.template_class = TimedTemplate
+        app.before_request(self._follow_switch)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        if app.config.get("REQUEST_INSTRUMENTATION", True):
+            self.enable()
+
+    def enable(self):
+        if not self.enabled:
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+            self.enabled = True
+
+    def disable(self):
+        if self.enabled:
+            self.enabled = False
+            event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+            if self.log is not None:
+                self.log.flush()
+
+    # Switches instrumentation in every worker.
+    def switch(self, enabled):
+        if self.switch_path is not None:
+            with open(self.switch_path + ".tmp", "w") as output:
+                output.write("on" if enabled else "off")
+            os.replace(self.switch_path + ".tmp", self.switch_path)
+        if enabled:
+            self.enable()
+        else:
+            self.disable()
+
+    def _follow_switch(self):
+        now = time.monotonic()
+        if self.switch_path is None or now - self._switch_checked < 1:
+            return
+        self._switch_checked = now
+        try:
+            with open(self.switch_path) as source:
+                state = source.read().strip()
+        except FileNotFoundError:
+            return
+        if state == "on":
+            self.enable()
+        elif state == "off":
+            self.disable()
+
+    def _before_request(self):
+        g.request_stats = RequestStats() if self.enabled else None
+
+    def _after_request(self, response):
+        stats = g.get("request_stats")
+        if stats is None:
+            return response
+        wall = time.perf_counter() - stats.started
+        response.headers["Server-Timing"] = (
+            'app;dur=%.1f, db;dur=%.1f;desc="%d queries, %d rows", tpl;dur=%.1f'
+            % (
+                wall * 1000,
+                stats.db * 1000,
+                stats.queries,
+                stats.rows,
+                stats.template * 1000,
+            )
+        )
+        if self.log is not None:
+            entry = {
+                "time": datetime.now().isoformat(timespec="milliseconds"),
+                "method": request.method,
+                "route": request.url_rule.rule if request.url_rule else None,
+                "path": request.path,
+                "status": response.status_code,
+            }
+            # A streamed body is still being generated; log the request
+            # once it has been sent.
+            response.call_on_close(lambda: self._log_request(entry, stats))
+        return response
+
+    def _log_request(self, entry, stats):
+        entry.update(
+            wall_ms=round((time.perf_counter() - stats.started) * 1000, 3),
+            db_ms=round(stats.db * 1000, 3),
+            queries=stats.queries,
+            rows=stats.rows,
+            template_ms=round(stats.template * 1000, 3),
+        )
+        self.log.append(entry)
+
+
+instrumentation = Instrumentation()
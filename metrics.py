@@ -0,0 +1,158 @@
+import os
+import time
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from sqlalchemy.pool import QueuePool
+
+# Prometheus metrics served at /metrics. With several worker processes
+# (gunicorn), point the prometheus_multiproc_dir environment variable at an
+# empty directory before the workers start: every worker then writes its
+# samples there and /metrics, whichever worker serves it, adds them up.
+# The server should call mark_process_dead(pid) when a worker exits so its
+# live gauges are dropped (see the README).
+
+REQUEST_DURATION = Histogram(
+    "fyyur_request_duration_seconds",
+    "Time spent serving requests.",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "fyyur_requests_in_flight",
+    "Requests being served.",
+    multiprocess_mode="livesum",
+)
+ERRORS = Counter(
+    "fyyur_errors_total",
+    "Responses with a 4xx or 5xx status, by the view that produced them.",
+    ["endpoint", "status"],
+)
+# The pool metrics are labelled with the database of the engine (primary
+# or replica), see label_pool().
+POOL_CHECKED_OUT = Gauge(
+    "fyyur_db_pool_checked_out",
+    "Database connections checked out of the pool.",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+POOL_OVERFLOW = Gauge(
+    "fyyur_db_pool_overflow",
+    "Database connections open beyond the pool size.",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+POOL_WAIT = Histogram(
+    "fyyur_db_pool_wait_seconds",
+    "Time spent waiting for a connection when the pool was exhausted.",
+    ["engine"],
+)
+POOL_TIMEOUTS = Counter(
+    "fyyur_db_pool_timeouts_total",
+    "Connection requests that timed out waiting for the pool.",
+    ["engine"],
+)
+PAGE_CACHE_REQUESTS = Counter(
+    "fyyur_page_cache_requests_total",
+    "Page cache lookups.",
+    ["result"],
+)
+
+
+# QueuePool (used by sessions.py) that reports its checked-out and overflow connections and the
+# checkouts that had to wait for a connection to be returned.
+class MeteredQueuePool(QueuePool):
+    label = "default"
+
+    def _do_get(self):
+        exhausted = (
+            self._pool.empty()
+            and self._max_overflow > -1
+            and self._overflow >= self._max_overflow
+        )
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            if exhausted:
+                POOL_TIMEOUTS.labels(self.label).inc()
+            raise
+        if exhausted:
+            POOL_WAIT.labels(self.label).observe(time.perf_counter() - started)
+        self._report()
+        return connection
+
+    def _do_return_conn(self, conn):
+        super()._do_return_conn(conn)
+        self._report()
+
+    def _report(self):
+        POOL_CHECKED_OUT.labels(self.label).set(self.checkedout())
+        POOL_OVERFLOW.labels(self.label).set(max(self.overflow(), 0))
+
+    # engine.dispose() replaces the pool with a new one.
+    def recreate(self):
+        pool = super().recreate()
+        pool.label = self.label
+        return pool
+
+
+# Labels the pool metrics of an engine with its host:port/database (the
+# file of a SQLite database); engines are created by Flask-SQLAlchemy and
+# replicas.py, which call this.
+def label_pool(engine):
+    if isinstance(engine.pool, MeteredQueuePool):
+        url = engine.url
+        host = url.host or ""
+        if url.port:
+            host += ":%d" % url.port
+        engine.pool.label = "%s/%s" % (host, url.database) if host else url.database
+    return engine
+
+
+class Metrics:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+
+    def _after_request(self, response):
+        started = g.get("metrics_started")
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            REQUEST_DURATION.labels(
+                request.method, route, response.status_code
+            ).observe(time.perf_counter() - started)
+        if response.status_code >= 400:
+            ERRORS.labels(request.endpoint or "unmatched", response.status_code).inc()
+        return response
+
+    def _teardown_request(self, error):
+        if g.pop("metrics_started", None) is not None:
+            REQUESTS_IN_FLIGHT.dec()
+
+    def response(self):
+        if "prometheus_multiproc_dir" in os.environ:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+metrics = Metrics()
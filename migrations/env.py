@@ -27,6 +27,17 @@ config.set_main_option(
     str(current_app.extensions['migrate'].db.engine.url).replace('%', '%%'))
 target_metadata = current_app.extensions['migrate'].db.metadata
 
+
+# The partitions of "Show" (Show_hot and the Show_archive_* tables, see
+# partitions.py) are created by migrations and `flask archive-shows`, not
+# by the models; autogenerate must not drop them.
+def include_object(object, name, type_, reflected, compare_to):
+    return not (
+        type_ == 'table' and reflected and compare_to is None
+        and name.startswith('Show_')
+    )
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -47,7 +58,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=target_metadata, literal_binds=True
+        url=url, target_metadata=target_metadata, literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -83,6 +95,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
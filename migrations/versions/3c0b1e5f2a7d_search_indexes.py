@@ -0,0 +1,37 @@
+"""trigram and genre search indexes
+
+Revision ID: 3c0b1e5f2a7d
+Revises: 99f59e969794
+Create Date: 2026-10-18 09:12:41.503118
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3c0b1e5f2a7d'
+down_revision = '99f59e969794'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('Venue', 'Artist'):
+        for column in ('name', 'city'):
+            op.create_index(
+                'ix_%s_%s_trgm' % (table.lower(), column), table, [column],
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'},
+            )
+        op.create_index(
+            'ix_%s_genres' % table.lower(), table, ['genres'],
+            postgresql_using='gin',
+        )
+
+
+def downgrade():
+    for table in ('Venue', 'Artist'):
+        op.drop_index('ix_%s_genres' % table.lower(), table_name=table)
+        for column in ('name', 'city'):
+            op.drop_index('ix_%s_%s_trgm' % (table.lower(), column), table_name=table)
@@ -0,0 +1,29 @@
+"""composite indexes for show access paths
+
+Revision ID: 8e4d2a61c9b0
+Revises: 3c0b1e5f2a7d
+Create Date: 2026-10-18 10:03:27.219846
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4d2a61c9b0'
+down_revision = '3c0b1e5f2a7d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_venue_id_start_time', 'Show', ['venue_id', 'start_time'])
+    op.create_index('ix_show_artist_id_start_time', 'Show', ['artist_id', 'start_time'])
+    op.create_index('ix_show_start_time_id', 'Show', ['start_time', 'id'])
+    op.create_index('ix_venue_city_state_id', 'Venue', ['city', 'state', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_venue_city_state_id', table_name='Venue')
+    op.drop_index('ix_show_start_time_id', table_name='Show')
+    op.drop_index('ix_show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='Show')
@@ -0,0 +1,69 @@
+"""partition shows by start_time into hot and archive partitions
+
+Revision ID: a6e2d9f41c73
+Revises: f3b9c1d7e254
+Create Date: 2026-10-18 15:02:48.113904
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6e2d9f41c73'
+down_revision = 'f3b9c1d7e254'
+branch_labels = None
+depends_on = None
+
+SHOW_INDEXES = {
+    'ix_show_venue_id_start_time': ['venue_id', 'start_time'],
+    'ix_show_artist_id_start_time': ['artist_id', 'start_time'],
+    'ix_show_start_time_id': ['start_time', 'id'],
+    'ix_show_updated_at': ['updated_at'],
+}
+
+
+def upgrade():
+    # The existing table becomes "Show_hot", the DEFAULT partition of a new
+    # "Show" partitioned by range of start_time; `flask archive-shows` then
+    # moves past shows into range partitions. Its indexes are renamed so the
+    # parent's indexes adopt them instead of building new ones. A primary
+    # key of a partitioned table has to include the partition key.
+    op.execute('ALTER TABLE "Show" RENAME TO "Show_hot"')
+    op.execute('ALTER TABLE "Show_hot" DROP CONSTRAINT "Show_pkey"')
+    op.execute('ALTER TABLE "Show_hot" DROP CONSTRAINT "Show_artist_id_fkey"')
+    op.execute('ALTER TABLE "Show_hot" DROP CONSTRAINT "Show_venue_id_fkey"')
+    for name in SHOW_INDEXES:
+        op.execute('ALTER INDEX %s RENAME TO %s' % (name, name.replace('ix_show_', 'ix_show_hot_')))
+
+    op.execute('CREATE TABLE "Show" (LIKE "Show_hot" INCLUDING DEFAULTS) PARTITION BY RANGE (start_time)')
+    op.execute('ALTER SEQUENCE "Show_id_seq" OWNED BY "Show".id')
+    op.create_primary_key('Show_pkey', 'Show', ['id', 'start_time'])
+    for name, columns in SHOW_INDEXES.items():
+        op.create_index(name, 'Show', columns)
+    op.execute('ALTER TABLE "Show" ATTACH PARTITION "Show_hot" DEFAULT')
+    op.create_foreign_key('Show_artist_id_fkey', 'Show', 'Artist', ['artist_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key('Show_venue_id_fkey', 'Show', 'Venue', ['venue_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    # Archived shows go back into "Show_hot", which becomes the plain table.
+    archives = [
+        name for name, in op.get_bind().execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = '\"Show\"'::regclass AND c.relname <> 'Show_hot'"
+        )
+    ]
+    for name in archives:
+        op.execute('ALTER TABLE "Show" DETACH PARTITION "%s"' % name)
+    op.execute('ALTER TABLE "Show" DETACH PARTITION "Show_hot"')
+    for name in archives:
+        op.execute('INSERT INTO "Show_hot" SELECT * FROM "%s"' % name)
+        op.execute('DROP TABLE "%s"' % name)
+
+    op.execute('ALTER SEQUENCE "Show_id_seq" OWNED BY "Show_hot".id')
+    op.execute('DROP TABLE "Show"')
+    op.execute('ALTER TABLE "Show_hot" RENAME TO "Show"')
+    op.execute('ALTER TABLE "Show" DROP CONSTRAINT "Show_hot_pkey"')
+    op.create_primary_key('Show_pkey', 'Show', ['id'])
+    for name in SHOW_INDEXES:
+        op.execute('ALTER INDEX %s RENAME TO %s' % (name.replace('ix_show_', 'ix_show_hot_'), name))
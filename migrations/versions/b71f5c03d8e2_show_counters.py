@@ -0,0 +1,43 @@
+"""denormalized upcoming and past show counters
+
+Revision ID: b71f5c03d8e2
+Revises: 8e4d2a61c9b0
+Create Date: 2026-10-18 11:20:05.638412
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b71f5c03d8e2'
+down_revision = '8e4d2a61c9b0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('CounterState',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # Backfill, equivalent to `flask reconcile-show-counters`.
+    op.execute('INSERT INTO "CounterState" (id, rolled_at) VALUES (1, LOCALTIMESTAMP)')
+    for table, key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.execute(
+            'UPDATE "{table}" SET '
+            'upcoming_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{key} = "{table}".id AND "Show".start_time >= LOCALTIMESTAMP), '
+            'past_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{key} = "{table}".id AND "Show".start_time < LOCALTIMESTAMP)'.format(table=table, key=key)
+        )
+
+
+def downgrade():
+    op.drop_table('CounterState')
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
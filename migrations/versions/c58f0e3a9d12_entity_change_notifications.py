@@ -0,0 +1,41 @@
+"""notify entity cache listeners of venue, artist and show changes
+
+Revision ID: c58f0e3a9d12
+Revises: a6e2d9f41c73
+Create Date: 2026-10-18 16:27:03.449120
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c58f0e3a9d12'
+down_revision = 'a6e2d9f41c73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Sends "<Model>:<id>" on the entity_changes channel for every updated or
+    # deleted row, delivered when the transaction commits (see entities.py).
+    # The model name is a trigger argument: on the partitioned Show table
+    # TG_TABLE_NAME is the partition's name.
+    op.execute('''
+        CREATE FUNCTION notify_entity_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('entity_changes', TG_ARGV[0] || ':' || OLD.id);
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    ''')
+    for table in ('Venue', 'Artist', 'Show'):
+        op.execute(
+            'CREATE TRIGGER "{table}_notify_change" AFTER UPDATE OR DELETE ON "{table}" '
+            "FOR EACH ROW EXECUTE PROCEDURE notify_entity_change('{table}')".format(table=table)
+        )
+
+
+def downgrade():
+    for table in ('Show', 'Artist', 'Venue'):
+        op.execute('DROP TRIGGER "{table}_notify_change" ON "{table}"'.format(table=table))
+    op.execute('DROP FUNCTION notify_entity_change()')
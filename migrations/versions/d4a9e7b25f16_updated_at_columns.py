@@ -0,0 +1,28 @@
+"""updated_at columns for incremental exports
+
+Revision ID: d4a9e7b25f16
+Revises: b71f5c03d8e2
+Create Date: 2026-10-18 13:41:52.904117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a9e7b25f16'
+down_revision = 'b71f5c03d8e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist', 'Show'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False))
+        op.create_index('ix_%s_updated_at' % table.lower(), table, ['updated_at'])
+
+
+def downgrade():
+    for table in ('Show', 'Artist', 'Venue'):
+        op.drop_index('ix_%s_updated_at' % table.lower(), table_name=table)
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,27 @@
+"""delete shows with their venue or artist
+
+Revision ID: f3b9c1d7e254
+Revises: d4a9e7b25f16
+Create Date: 2026-10-18 14:12:37.520841
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b9c1d7e254'
+down_revision = 'd4a9e7b25f16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for column, table in (('artist_id', 'Artist'), ('venue_id', 'Venue')):
+        op.drop_constraint('Show_%s_fkey' % column, 'Show', type_='foreignkey')
+        op.create_foreign_key('Show_%s_fkey' % column, 'Show', table, [column], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    for column, table in (('artist_id', 'Artist'), ('venue_id', 'Venue')):
+        op.drop_constraint('Show_%s_fkey' % column, 'Show', type_='foreignkey')
+        op.create_foreign_key('Show_%s_fkey' % column, 'Show', table, [column], ['id'])
@@ -1,11 +1,42 @@
 from datetime import datetime
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql
+from replicas import RoutingSQLAlchemy
 
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
+
+# Genres are a Postgres array (the dialect type, which supports the @>
+# containment search.py uses); on SQLite, used for benchmark databases,
+# they are stored as a JSON list.
+genre_list = postgresql.ARRAY(db.String(120)).with_variant(db.JSON, "sqlite")
+
+
+# Trigram indexes back the case-insensitive substring search on name and
+# city, the GIN index on genres backs whole-genre matches. See search.py.
+def search_indexes(table):
+    return (
+        db.Index(
+            "ix_%s_name_trgm" % table.lower(),
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        db.Index(
+            "ix_%s_city_trgm" % table.lower(),
+            "city",
+            postgresql_using="gin",
+            postgresql_ops={"city": "gin_trgm_ops"},
+        ),
+        db.Index("ix_%s_genres" % table.lower(), "genres", postgresql_using="gin"),
+    )
 
 
 class Venue(db.Model):
     __tablename__ = "Venue"
+    __table_args__ = search_indexes("Venue") + (
+        db.Index("ix_venue_city_state_id", "city", "state", "id"),
+        db.Index("ix_venue_updated_at", "updated_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -15,43 +46,111 @@ class Venue(db.Model):
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String(120)))
+    genres = db.Column(genre_list)
     website = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(120))
 
+    # Maintained by counters.py on every Show write and roll.
+    upcoming_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    past_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+
+    # Read by `flask export --since-last-run`.
+    updated_at = db.Column(
+        db.DateTime, nullable=False, server_default=func.now(), onupdate=func.now()
+    )
+
     # TODO Done: implement any missing fields, as a database migration using Flask-Migrate
+    # Shows are deleted by the database (ON DELETE CASCADE), not loaded and
+    # deleted one by one; see deletes.py.
     shows = db.relationship(
-        "Show", backref="venue", lazy=True, cascade="all, delete-orphan"
+        "Show",
+        backref="venue",
+        lazy=True,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
 
 class Artist(db.Model):
     __tablename__ = "Artist"
+    __table_args__ = search_indexes("Artist") + (
+        db.Index("ix_artist_updated_at", "updated_at"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String(120)))
+    genres = db.Column(genre_list)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(120))
 
+    # Maintained by counters.py on every Show write and roll.
+    upcoming_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    past_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+
+    # Read by `flask export --since-last-run`.
+    updated_at = db.Column(
+        db.DateTime, nullable=False, server_default=func.now(), onupdate=func.now()
+    )
+
     # TODO Done: implement any missing fields, as a database migration using Flask-Migrate
+    # Shows are deleted by the database (ON DELETE CASCADE), not loaded and
+    # deleted one by one; see deletes.py.
     shows = db.relationship(
-        "Show", backref="artist", lazy=True, cascade="all, delete-orphan"
+        "Show",
+        backref="artist",
+        lazy=True,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
 
 # TODO Done Implement Show and Artist models, and complete all model relationships and properties,
 # as a database migration.
+# On Postgres the table is partitioned by start_time into a hot partition
+# and archives (see partitions.py); its primary key there is (id,
+# start_time). The mapper keeps id alone as the identity: the id sequence
+# keeps it unique across partitions.
 class Show(db.Model):
     __tablename__ = "Show"
+    # Access paths of the show tiles, detail pages and upcoming counts.
+    __table_args__ = (
+        db.Index("ix_show_venue_id_start_time", "venue_id", "start_time"),
+        db.Index("ix_show_artist_id_start_time", "artist_id", "start_time"),
+        db.Index("ix_show_start_time_id", "start_time", "id"),
+        db.Index("ix_show_updated_at", "updated_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     start_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    artist_id = db.Column(db.Integer, db.ForeignKey("Artist.id"), nullable=False)
-    venue_id = db.Column(db.Integer, db.ForeignKey("Venue.id"), nullable=False)
+    artist_id = db.Column(
+        db.Integer, db.ForeignKey("Artist.id", ondelete="CASCADE"), nullable=False
+    )
+    venue_id = db.Column(
+        db.Integer, db.ForeignKey("Venue.id", ondelete="CASCADE"), nullable=False
+    )
+    updated_at = db.Column(
+        db.DateTime, nullable=False, server_default=func.now(), onupdate=func.now()
+    )
+
+
+# Instant up to which the show counters are rolled: shows starting at or
+# after it are counted as upcoming, earlier ones as past.
+class CounterState(db.Model):
+    __tablename__ = "CounterState"
+
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_at = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,113 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+from flask import abort, current_app, request, url_for
+from sqlalchemy import literal, tuple_
+
+Page = namedtuple("Page", ["items", "next_cursor", "prev_cursor"])
+
+
+# A forward page whose rows are fetched while the template iterates `items`.
+# The cursors are known once the rows have been consumed, which is why the
+# pager is rendered after the list.
+class StreamingPage:
+    def __init__(self, rows, key, per_page, has_prev):
+        self.next_cursor = None
+        self.prev_cursor = None
+        self.items = self._iterate(rows, key, per_page, has_prev)
+
+    def _iterate(self, rows, key, per_page, has_prev):
+        count = 0
+        last = None
+        for row in rows:
+            if count == per_page:
+                self.next_cursor = encode_cursor(key(last))
+                continue
+            if count == 0 and has_prev:
+                self.prev_cursor = encode_cursor(key(row))
+            count += 1
+            last = row
+            yield row
+
+
+# Cursors are the sort key of a boundary row, JSON encoded and made url safe.
+def encode_cursor(values):
+    payload = json.dumps(
+        [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor, columns):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(values) != len(columns):
+            raise ValueError(cursor)
+        return [
+            datetime.fromisoformat(v) if c.type.python_type is datetime else v
+            for c, v in zip(columns, values)
+        ]
+    except (ValueError, TypeError):
+        abort(400)
+
+
+# Link to the current listing with one section's cursor replaced, keeping
+# the page size and the cursors of any other section.
+def page_url(prefix, direction, cursor):
+    args = request.args.to_dict()
+    args.pop(prefix + "after", None)
+    args.pop(prefix + "before", None)
+    args[prefix + direction] = cursor
+    return url_for(request.endpoint, **request.view_args, **args)
+
+
+def page_size():
+    size = request.args.get("per_page", current_app.config["PAGE_SIZE"], type=int)
+    return max(1, min(size, current_app.config["MAX_PAGE_SIZE"]))
+
+
+# Fetches one page of `query` ordered by `columns`, starting after or before
+# the row encoded in the cursor. The bound is a row-value comparison on the
+# sort key, so deep pages are served from the index like the first page.
+# With `stream`, forward pages are returned as a StreamingPage reading from
+# a server-side cursor.
+def keyset_page(query, columns, key, prefix="", descending=False, stream=False):
+    after = request.args.get(prefix + "after")
+    before = request.args.get(prefix + "before")
+    backwards = before is not None
+    cursor = before if backwards else after
+    ascending = backwards == descending
+    per_page = page_size()
+
+    if cursor is not None:
+        bound = tuple_(
+            *[
+                literal(v, type_=c.type)
+                for c, v in zip(columns, decode_cursor(cursor, columns))
+            ]
+        )
+        keys = tuple_(*columns)
+        query = query.filter(keys > bound if ascending else keys < bound)
+
+    query = query.order_by(None).order_by(
+        *[c if ascending else c.desc() for c in columns]
+    )
+    query = query.limit(per_page + 1)
+    if stream and not backwards:
+        rows = query.execution_options(stream_results=True).yield_per(per_page + 1)
+        return StreamingPage(rows, key, per_page, cursor is not None)
+
+    rows = query.all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return Page([], None, None)
+    first = encode_cursor(key(rows[0]))
+    last = encode_cursor(key(rows[-1]))
+    if backwards:
+        return Page(rows, last, first if more else None)
+    return Page(rows, last if more else None, first if cursor is not None else None)
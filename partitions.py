@@ -0,0 +1,119 @@
+import json
+from datetime import date, datetime, time, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import text
+from models import Show, db
+
+# On Postgres, Show is partitioned by range of start_time (migration
+# a6e2d9f41c73). "Show_hot", the DEFAULT partition, holds every show from
+# the archive boundary on; each "Show_archive_YYYYMMDD" partition holds the
+# shows from the previous boundary up to that date. The boundary is always
+# in the past and every upcoming-show query filters on start_time >= now,
+# so Postgres prunes the archive partitions from their plans and they only
+# read Show_hot. `flask archive-shows` (run from cron) moves the shows older
+# than SHOW_ARCHIVE_AFTER_DAYS into a new archive partition.
+
+HOT_PARTITION = "Show_hot"
+ARCHIVE_PREFIX = "Show_archive_"
+
+
+def partitions(connection):
+    return [
+        name
+        for name, in connection.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = '\"Show\"'::regclass ORDER BY c.relname"
+        )
+    ]
+
+
+def archive_boundary(names):
+    dates = [
+        datetime.strptime(name[len(ARCHIVE_PREFIX) :], "%Y%m%d")
+        for name in names
+        if name.startswith(ARCHIVE_PREFIX)
+    ]
+    return max(dates, default=None)
+
+
+# Moves the shows starting before `before` (a past midnight) out of the hot
+# partition into a new archive partition, in the session's transaction.
+# Attaching the partition checks that no such show is left in Show_hot, so
+# a show inserted concurrently into the archived range makes it fail rather
+# than be lost. Returns the number of shows moved.
+def archive_shows(before):
+    connection = db.session.connection()
+    lower = archive_boundary(partitions(connection))
+    if lower is not None and before <= lower:
+        return 0
+
+    name = ARCHIVE_PREFIX + before.strftime("%Y%m%d")
+    connection.execute('CREATE TABLE "%s" (LIKE "Show" INCLUDING DEFAULTS)' % name)
+    moved = connection.execute(
+        text(
+            'WITH moved AS (DELETE FROM "%s" WHERE start_time < :before RETURNING *) '
+            'INSERT INTO "%s" SELECT * FROM moved' % (HOT_PARTITION, name)
+        ),
+        before=before,
+    ).rowcount
+    connection.execute(
+        'ALTER TABLE "Show" ATTACH PARTITION "%s" FOR VALUES FROM (%s) TO (\'%s\')'
+        % (name, "MINVALUE" if lower is None else "'%s'" % lower, before)
+    )
+    return moved
+
+
+# Partitions the plan of an upcoming-show query reads.
+def upcoming_partitions(connection):
+    query = db.session.query(Show.id).filter(Show.start_time >= datetime.now())
+    compiled = query.statement.compile(dialect=connection.dialect)
+    plan = connection.execute(
+        "EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    relations = set()
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if "Relation Name" in node:
+            relations.add(node["Relation Name"])
+        nodes.extend(node.get("Plans", []))
+    return relations
+
+
+@click.command("archive-shows")
+@click.option(
+    "--before",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="Archive shows before this date [default: SHOW_ARCHIVE_AFTER_DAYS ago].",
+)
+@with_appcontext
+def archive_shows_command(before):
+    """Move past shows from the hot partition into an archive partition."""
+    if db.engine.dialect.name != "postgresql":
+        raise click.ClickException("archive-shows needs a PostgreSQL database")
+    if HOT_PARTITION not in partitions(db.session.connection()):
+        raise click.ClickException(
+            "The Show table is not partitioned; run `flask db upgrade`"
+        )
+    if before is None:
+        days = current_app.config.get("SHOW_ARCHIVE_AFTER_DAYS", 90)
+        before = datetime.combine(date.today(), time()) - timedelta(days=days)
+    if before > datetime.now():
+        raise click.ClickException("Only past shows can be archived")
+
+    moved = archive_shows(before)
+    db.session.commit()
+    click.echo("Archived %d shows starting before %s" % (moved, before.date()))
+
+    relations = upcoming_partitions(db.session.connection())
+    db.session.remove()
+    if relations - {HOT_PARTITION}:
+        raise click.ClickException(
+            "Upcoming-show queries read %s" % ", ".join(sorted(relations))
+        )
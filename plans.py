@@ -0,0 +1,101 @@
+import json
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from models import Venue, Artist, Show, db
+
+# Every listing, detail and search view is requested once through the test
+# client; each SELECT it issues is then EXPLAINed with sequential scans
+# disabled, so a remaining Seq Scan means no index can serve the query.
+
+
+def hot_path_requests(venue_id, artist_id, show_id):
+    return [
+        ("GET", "/venues", None),
+        ("GET", "/venues/%d" % venue_id, None),
+        ("POST", "/venues/search", {"search_term": "a"}),
+        ("GET", "/venues/%d/edit" % venue_id, None),
+        ("GET", "/artists", None),
+        ("GET", "/artists/%d" % artist_id, None),
+        ("POST", "/artists/search", {"search_term": "a"}),
+        ("GET", "/artists/%d/edit" % artist_id, None),
+        ("GET", "/shows", None),
+        ("POST", "/shows/search", {"search_term": "a"}),
+        ("GET", "/shows/%d/edit" % show_id, None),
+    ]
+
+
+def capture_queries(app, requests):
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((path, statement, parameters))
+
+    # GETs and searches read from the replicas when there are any.
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        client = app.test_client()
+        for method, path, data in requests:
+            client.open(path, method=method, data=data)
+    finally:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+    return captured
+
+
+def seq_scans(connection, statement, parameters):
+    connection.execute("SET enable_seqscan = off")
+    try:
+        plan = connection.execute(
+            "EXPLAIN (FORMAT JSON) " + statement, parameters
+        ).scalar()
+    finally:
+        connection.execute("RESET enable_seqscan")
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    scans = []
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if node["Node Type"] == "Seq Scan":
+            scans.append(node["Relation Name"])
+        nodes.extend(node.get("Plans", []))
+    return scans
+
+
+@click.command("check-plans")
+@click.option("--verbose", is_flag=True, help="Print every explained query.")
+@with_appcontext
+def check_plans(verbose):
+    """EXPLAIN the views' queries and fail on sequential scans."""
+    if db.engine.dialect.name != "postgresql":
+        raise click.ClickException("check-plans needs a PostgreSQL database")
+    venue = db.session.query(Venue.id).first()
+    artist = db.session.query(Artist.id).first()
+    show = db.session.query(Show.id).first()
+    db.session.remove()
+    if venue is None or artist is None or show is None:
+        raise click.ClickException(
+            "check-plans needs a seeded database with at least one show"
+        )
+
+    requests = hot_path_requests(venue.id, artist.id, show.id)
+    failures = 0
+    with db.engine.connect() as connection:
+        for path, statement, parameters in capture_queries(current_app, requests):
+            scans = seq_scans(connection, statement, parameters)
+            if scans:
+                failures += 1
+                click.echo("SEQ SCAN on %s in %s:" % (", ".join(scans), path))
+                click.echo("    " + " ".join(statement.split()))
+            elif verbose:
+                click.echo("ok %s: %s" % (path, " ".join(statement.split())))
+
+    if failures:
+        raise click.ClickException(
+            "%d queries fall back to a sequential scan" % failures
+        )
+    click.echo("All view queries are served by indexes.")
@@ -0,0 +1,119 @@
+from datetime import datetime
+from itertools import groupby
+from types import SimpleNamespace
+from flask import abort
+from sqlalchemy import case, func
+from models import Venue, Artist, Show, db
+from pagination import keyset_page
+
+
+# Column-only projection of a show together with the venue and artist
+# fields the show tiles display. One joined query replaces the per-row
+# Venue/Artist lookups.
+def show_card_query(*criteria):
+    return (
+        db.session.query(
+            Show.id,
+            Show.venue_id,
+            Show.artist_id,
+            Show.start_time,
+            Venue.name.label("venue_name"),
+            Venue.image_link.label("venue_image_link"),
+            Artist.name.label("artist_name"),
+            Artist.image_link.label("artist_image_link"),
+        )
+        .join(Venue, Show.venue_id == Venue.id)
+        .join(Artist, Show.artist_id == Artist.id)
+        .filter(*criteria)
+        .order_by(Show.start_time, Show.id)
+    )
+
+
+# start_time stays a datetime; the `datetime` template filter formats it.
+def show_card(row):
+    return row._asdict()
+
+
+def show_cards(*criteria):
+    return [show_card(row) for row in show_card_query(*criteria)]
+
+
+# Upcoming and past show counts of one venue or artist, in one aggregate
+# query over the (foreign key, start_time) index.
+def show_counts(now, *criteria):
+    upcoming = func.count(case([(Show.start_time >= now, 1)]))
+    row = (
+        db.session.query(upcoming.label("upcoming"), func.count().label("total"))
+        .filter(*criteria)
+        .one()
+    )
+    return row.upcoming, row.total - row.upcoming
+
+
+# View model of a venue or artist page: the entity's column values plus one
+# keyset page of upcoming shows (soonest first) and one of past shows (most
+# recent first), each paged on its own with the upcoming_/past_ cursors.
+def detail_page(model, foreign_key, entity_id):
+    entity = (
+        db.session.query(*model.__table__.columns).filter(model.id == entity_id).first()
+    )
+    if entity is None:
+        abort(404)
+
+    now = datetime.now()
+    upcoming_page = keyset_page(
+        show_card_query(foreign_key == entity_id, Show.start_time >= now),
+        [Show.start_time, Show.id],
+        key=lambda row: (row.start_time, row.id),
+        prefix="upcoming_",
+    )
+    past_page = keyset_page(
+        show_card_query(foreign_key == entity_id, Show.start_time < now),
+        [Show.start_time, Show.id],
+        key=lambda row: (row.start_time, row.id),
+        prefix="past_",
+        descending=True,
+    )
+    upcoming_count, past_count = show_counts(now, foreign_key == entity_id)
+
+    # The live counts replace the entity's denormalized counter columns.
+    fields = entity._asdict()
+    fields.update(
+        upcoming_shows=[show_card(row) for row in upcoming_page.items],
+        past_shows=[show_card(row) for row in past_page.items],
+        upcoming_shows_count=upcoming_count,
+        past_shows_count=past_count,
+        upcoming_page=upcoming_page,
+        past_page=past_page,
+    )
+    return SimpleNamespace(**fields)
+
+
+# Venue listing rows with their upcoming show count, ordered so that the
+# venues of one city/state pair are adjacent.
+def venue_area_query():
+    return db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.upcoming_shows_count.label("num_upcoming_shows"),
+    ).order_by(Venue.city, Venue.state, Venue.id)
+
+
+# Groups ordered venue rows into areas in a single pass, yielding each area
+# as soon as its last venue has been read.
+def venue_areas(rows):
+    for (city, state), venues in groupby(rows, key=lambda row: (row.city, row.state)):
+        yield {
+            "city": city,
+            "state": state,
+            "venues": [
+                {
+                    "id": venue.id,
+                    "name": venue.name,
+                    "num_upcoming_shows": venue.num_upcoming_shows,
+                }
+                for venue in venues
+            ],
+        }
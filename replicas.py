@@ -0,0 +1,134 @@
+import itertools
+import threading
+import time
+from flask import current_app, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, event, exc, orm
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.selectable import SelectBase
+from metrics import label_pool
+
+# Read-replica routing. Requests that only read (GET/HEAD, and views marked
+# with @replica_reads such as the POST search forms) send their SELECTs to
+# one of SQLALCHEMY_REPLICA_URIS, picked round-robin. Everything else goes
+# to the primary: writes, SELECTs of a session that has already flushed,
+# and every request of a browser session for REPLICA_STICKY_SECONDS after
+# it wrote, so a redirect after a POST reads its own write. A replica that
+# fails to connect is skipped for REPLICA_RETRY_INTERVAL seconds; when no
+# replica is healthy, reads go to the primary.
+
+
+class ReplicaSet:
+    def __init__(self, uris, engine_options=None, retry_interval=30):
+        self.engines = [
+            label_pool(create_engine(uri, **(engine_options or {}))) for uri in uris
+        ]
+        self.retry_interval = retry_interval
+        self._down_until = [0.0] * len(self.engines)
+        self._turns = itertools.count()
+        self._lock = threading.Lock()
+        for engine in self.engines:
+            event.listen(engine, "handle_error", self._check_error)
+
+    def _check_error(self, context):
+        if context.is_disconnect:
+            self.mark_down(context.engine)
+
+    def choose(self):
+        now = time.monotonic()
+        with self._lock:
+            start = next(self._turns)
+        for offset in range(len(self.engines)):
+            index = (start + offset) % len(self.engines)
+            if self._down_until[index] <= now:
+                return self.engines[index]
+        return None
+
+    def mark_down(self, engine):
+        index = self.engines.index(engine)
+        self._down_until[index] = time.monotonic() + self.retry_interval
+
+
+class RoutingSession(SignallingSession):
+    def get_bind(self, mapper=None, clause=None):
+        # Core INSERT/UPDATE/DELETE statements skip the flush; they count
+        # as writes too.
+        if isinstance(clause, UpdateBase):
+            self.info["wrote"] = True
+        replicas = self.app.extensions.get("replicas")
+        if (
+            replicas is not None
+            and self.info.get("use_replica")
+            and not self.info.get("wrote")
+            and not self._flushing
+            and isinstance(clause, SelectBase)
+        ):
+            engine = replicas.choose()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper, clause)
+
+    # Falls back to the primary when a replica cannot be reached.
+    def _connection_for_bind(self, engine, execution_options=None, **kw):
+        replicas = self.app.extensions.get("replicas")
+        if replicas is None or engine not in replicas.engines:
+            return super()._connection_for_bind(engine, execution_options, **kw)
+        try:
+            return super()._connection_for_bind(engine, execution_options, **kw)
+        except exc.OperationalError:
+            replicas.mark_down(engine)
+            return super()._connection_for_bind(
+                super().get_bind(), execution_options, **kw
+            )
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def remember_write(session, flush_context):
+    session.info["wrote"] = True
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def create_engine(self, sa_url, engine_opts):
+        return label_pool(super().create_engine(sa_url, engine_opts))
+
+
+def replica_reads(view):
+    view.replica_reads = True
+    return view
+
+
+class ReplicaRouter:
+    def __init__(self, db, app=None):
+        self.db = db
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        uris = app.config.get("SQLALCHEMY_REPLICA_URIS")
+        if not uris:
+            return
+        app.extensions["replicas"] = ReplicaSet(
+            uris,
+            app.config.get("SQLALCHEMY_ENGINE_OPTIONS"),
+            app.config.get("REPLICA_RETRY_INTERVAL", 30),
+        )
+        self.sticky_seconds = app.config.get("REPLICA_STICKY_SECONDS", 5)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_request(self):
+        view = current_app.view_functions.get(request.endpoint)
+        reads_only = request.method in ("GET", "HEAD") or getattr(
+            view, "replica_reads", False
+        )
+        self.db.session.info["use_replica"] = (
+            reads_only and session.get("_primary_until", 0) < time.time()
+        )
+
+    def _after_request(self, response):
+        if self.db.session.info.get("wrote"):
+            session["_primary_until"] = time.time() + self.sticky_seconds
+        return response
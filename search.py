@@ -0,0 +1,115 @@
+from flask import current_app
+from sqlalchemy import func, or_
+from forms import GENRES
+from models import Venue, Artist, Show, db
+from projections import show_card, show_card_query
+
+# Search matches a case-insensitive substring of the name or city, or a
+# genre spelled out in full. On Postgres the name and city predicates are
+# served by the pg_trgm GIN indexes and the genre by the GIN index on the
+# genres array (migration 3c0b1e5f2a7d); results are ranked by trigram
+# similarity of the name. Other databases (SQLite in development) fall
+# back to matching and ranking in Python.
+
+
+def _genre(term):
+    for genre, _ in GENRES:
+        if genre.lower() == term.strip().lower():
+            return genre
+    return None
+
+
+def _is_postgres():
+    return db.engine.dialect.name == "postgresql"
+
+
+def _trigrams(text):
+    grams = set()
+    for word in text.lower().split():
+        padded = "  " + word + " "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+# Same measure as pg_trgm's similarity(): shared trigrams over all trigrams.
+def trigram_similarity(a, b):
+    a, b = _trigrams(a or ""), _trigrams(b or "")
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+# Returns (total, rows) where rows carry id, name and upcoming_shows_count,
+# best match first.
+def _search(model, term):
+    limit = current_app.config["SEARCH_LIMIT"]
+    pattern = "%" + term + "%"
+    genre = _genre(term)
+
+    if not _is_postgres():
+        return _search_in_python(model, term, genre, limit)
+
+    name_match = model.name.ilike(pattern)
+    criteria = [name_match, model.city.ilike(pattern)]
+    if genre is not None:
+        criteria.append(model.genres.contains([genre]))
+    rows = (
+        db.session.query(
+            model.id,
+            model.name,
+            model.upcoming_shows_count,
+            func.count().over().label("total"),
+        )
+        .filter(or_(*criteria))
+        .order_by(name_match.desc(), func.similarity(model.name, term).desc(), model.id)
+        .limit(limit)
+        .all()
+    )
+    return (rows[0].total if rows else 0), rows
+
+
+def _search_in_python(model, term, genre, limit):
+    needle = term.lower()
+    matches = []
+    rows = db.session.query(
+        model.id, model.name, model.upcoming_shows_count, model.city, model.genres
+    )
+    for row in rows:
+        name_match = needle in (row.name or "").lower()
+        if (
+            name_match
+            or needle in (row.city or "").lower()
+            or (genre is not None and genre in (row.genres or []))
+        ):
+            rank = (not name_match, -trigram_similarity(row.name, term), row.id)
+            matches.append((rank, row))
+    matches.sort(key=lambda match: match[0])
+    return len(matches), [row for _, row in matches[:limit]]
+
+
+def find_venues(term):
+    return _search(Venue, term)
+
+
+def find_artists(term):
+    return _search(Artist, term)
+
+
+# Shows whose artist or venue name matches, soonest first. The name
+# lookups run as subqueries so each one can use its own trigram index.
+def find_shows(term):
+    pattern = "%" + term + "%"
+    artist_ids = db.session.query(Artist.id).filter(Artist.name.ilike(pattern))
+    venue_ids = db.session.query(Venue.id).filter(Venue.name.ilike(pattern))
+    rows = (
+        show_card_query(
+            or_(
+                Show.artist_id.in_(artist_ids.subquery()),
+                Show.venue_id.in_(venue_ids.subquery()),
+            )
+        )
+        .add_columns(func.count().over().label("total"))
+        .limit(current_app.config["SEARCH_LIMIT"])
+        .all()
+    )
+    return (rows[0].total if rows else 0), [show_card(row) for row in rows]
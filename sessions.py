@@ -0,0 +1,71 @@
+import sqlite3
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import NullPool
+from metrics import MeteredQueuePool
+
+# Engine pool settings and the request session lifecycle.
+#
+# By default every worker keeps a pool of DATABASE_POOL_SIZE connections
+# plus up to DATABASE_MAX_OVERFLOW more under load, so a deployment opens
+# at most workers * (size + overflow) connections. Behind a transaction
+# pooler such as PgBouncer (DATABASE_PGBOUNCER) the app keeps no pool of
+# its own: connections are opened per transaction and the pooler shares
+# the server connections. Nothing the app does needs session state on the
+# server: psycopg2 does not prepare statements and streamed results use
+# named cursors inside their transaction. The entity cache's LISTEN does, so
+# it connects to ENTITY_CACHE_LISTEN_URI instead (see entities.py).
+#
+# The session is removed at the end of every request (once a streamed
+# response has been sent), which rolls back whatever was not committed and
+# returns its connection; views only commit or roll back.
+
+
+# SQLite only enforces foreign keys, and so ON DELETE CASCADE, on the
+# connections that ask for it.
+@event.listens_for(Engine, "connect")
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def engine_options(config):
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    options = {}
+    if url.get_backend_name() == "sqlite":
+        # An in-memory database lives in its one connection.
+        if url.database in (None, "", ":memory:"):
+            return options
+        # Pooled connections are handed from thread to thread.
+        options["connect_args"] = {"check_same_thread": False}
+    elif config.get("DATABASE_PGBOUNCER"):
+        return {"poolclass": NullPool}
+    options.update(
+        poolclass=MeteredQueuePool,
+        pool_size=config.get("DATABASE_POOL_SIZE", 5),
+        max_overflow=config.get("DATABASE_MAX_OVERFLOW", 10),
+        pool_timeout=config.get("DATABASE_POOL_TIMEOUT", 30),
+        pool_recycle=config.get("DATABASE_POOL_RECYCLE", 1800),
+        pool_pre_ping=config.get("DATABASE_POOL_PRE_PING", True),
+    )
+    return options
+
+
+class SessionLifecycle:
+    def __init__(self, db, app=None):
+        self.db = db
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Explicit SQLALCHEMY_ENGINE_OPTIONS win over the pool settings.
+        options = engine_options(app.config)
+        options.update(app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+        app.teardown_request(self._teardown_request)
+
+    def _teardown_request(self, error):
+        self.db.session.remove()
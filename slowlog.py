@@ -0,0 +1,212 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Slow-query log. Every SQL statement is timed through engine events; one
+# that takes longer than SLOW_QUERY_THRESHOLD_MS is logged as a JSON line
+# to the "slow_queries" logger (a rotating file next to error.log, see
+# app.py) with its SQL, bound parameters, the view and the app source line
+# that ran it, and its plan: EXPLAIN on Postgres (EXPLAIN ANALYZE for
+# SELECTs with SLOW_QUERY_EXPLAIN_ANALYZE, which runs them a second time),
+# EXPLAIN QUERY PLAN on SQLite.
+#
+# Parameters whose bind name contains one of SLOW_QUERY_REDACT (e.g. the
+# phone of a venue or artist) are logged as "***". Statements
+# are grouped by their SQL text: a statement is logged with its plan when
+# it is first slow, then at most once per SLOW_QUERY_GROUP_INTERVAL seconds
+# with the number of slow runs, their total and their maximum duration
+# since it was last logged. Only the SLOW_QUERY_MAX_GROUPS statements most
+# recently slow are remembered; a forgotten one is logged with its plan
+# again the next time it is slow.
+
+logger = logging.getLogger("slow_queries")
+
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class StatementGroup:
+    __slots__ = ("logged_at", "count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.logged_at = None
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+
+def fingerprint(statement):
+    return hashlib.sha1(statement.encode()).hexdigest()[:12]
+
+
+def redacted_parameters(context, parameters, redact):
+    if context is None or context.compiled is None:
+        names = None
+    elif context.compiled.positional:
+        names = context.compiled.positiontup
+    else:
+        names = None
+
+    def redacted(name, value):
+        if name and any(word in name.lower() for word in redact):
+            return "***"
+        if isinstance(value, (str, int, float, bool)) or value is None:
+            return value
+        return str(value)
+
+    if isinstance(parameters, dict):
+        return {name: redacted(name, value) for name, value in parameters.items()}
+    if names is not None and len(names) == len(parameters):
+        return {name: redacted(name, value) for name, value in zip(names, parameters)}
+    return [redacted(None, value) for value in parameters]
+
+
+# The innermost frame of the app's own code, e.g. "app.py:152 show_venue".
+def caller():
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        path = os.path.abspath(frame.filename)
+        if (
+            path.startswith(APP_ROOT)
+            and "site-packages" not in path
+            and path != os.path.abspath(__file__)
+        ):
+            return "%s:%d %s" % (
+                os.path.relpath(path, APP_ROOT),
+                frame.lineno,
+                frame.name,
+            )
+    return None
+
+
+def explain(cursor, dialect, statement, parameters, analyze):
+    if dialect.name == "postgresql":
+        options = "ANALYZE, FORMAT JSON" if analyze else "FORMAT JSON"
+        explain_statement = "EXPLAIN (%s) %s" % (options, statement)
+    elif dialect.name == "sqlite":
+        explain_statement = "EXPLAIN QUERY PLAN " + statement
+    else:
+        return None
+
+    explain_cursor = cursor.connection.cursor()
+    try:
+        # A failed EXPLAIN must not abort the view's transaction.
+        if dialect.name == "postgresql":
+            explain_cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            explain_cursor.execute(explain_statement, parameters)
+            rows = explain_cursor.fetchall()
+        except Exception as error:
+            if dialect.name == "postgresql":
+                explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            return {"error": str(error).strip()}
+        if dialect.name == "postgresql":
+            explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+    finally:
+        explain_cursor.close()
+
+    if dialect.name == "postgresql":
+        plan = rows[0][0]
+        return json.loads(plan) if isinstance(plan, str) else plan
+    return [row[-1] for row in rows]
+
+
+class SlowQueryLog:
+    def __init__(self, app=None):
+        self.threshold = None
+        self.groups = OrderedDict()
+        self.max_groups = 1000
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        threshold = app.config.get("SLOW_QUERY_THRESHOLD_MS")
+        if threshold is None:
+            return
+        self.threshold = threshold / 1000
+        self.redact = [word.lower() for word in app.config.get("SLOW_QUERY_REDACT", ())]
+        self.analyze = app.config.get("SLOW_QUERY_EXPLAIN_ANALYZE", False)
+        self.interval = app.config.get("SLOW_QUERY_GROUP_INTERVAL", 60)
+        self.max_groups = app.config.get("SLOW_QUERY_MAX_GROUPS", 1000)
+        event.listen(Engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        # On the execution context, which goes away with a failed statement.
+        if context is not None:
+            context._slow_query_started = time.perf_counter()
+
+    def _after_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        started = getattr(context, "_slow_query_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if elapsed < self.threshold:
+            return
+
+        elapsed_ms = elapsed * 1000
+        key = fingerprint(statement)
+        now = time.monotonic()
+        with self._lock:
+            group = self.groups.get(key)
+            if group is None:
+                group = self.groups[key] = StatementGroup()
+                while len(self.groups) > self.max_groups:
+                    self.groups.popitem(last=False)
+            else:
+                self.groups.move_to_end(key)
+            group.count += 1
+            group.total_ms += elapsed_ms
+            group.max_ms = max(group.max_ms, elapsed_ms)
+            if group.logged_at is not None and now - group.logged_at < self.interval:
+                return
+            first = group.logged_at is None
+            count, total_ms, max_ms = group.count, group.total_ms, group.max_ms
+            group.logged_at = now
+            group.count, group.total_ms, group.max_ms = 0, 0.0, 0.0
+
+        executemany_rows = None
+        if executemany:
+            executemany_rows = len(parameters)
+            parameters = parameters[0] if parameters else ()
+        entry = {
+            "fingerprint": key,
+            "duration_ms": round(elapsed_ms, 3),
+            "statement": statement,
+            "parameters": redacted_parameters(context, parameters, self.redact),
+            "executemany_rows": executemany_rows,
+            "view": None,
+            "caller": caller(),
+            "occurrences": count,
+            "total_ms": round(total_ms, 3),
+            "max_ms": round(max_ms, 3),
+        }
+        if has_request_context():
+            entry["view"] = request.endpoint
+            entry["path"] = request.path
+        # Plans are captured the first time a statement is slow; later
+        # entries for it carry the counts only.
+        if first:
+            analyze = (
+                self.analyze
+                and not executemany
+                and statement.lstrip().upper().startswith("SELECT")
+            )
+            entry["plan"] = explain(
+                cursor, conn.dialect, statement, parameters, analyze
+            )
+        logger.warning(json.dumps(entry, default=str))
+
+
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,18 @@
+from flask import Response, current_app, render_template, stream_with_context
+
+# Listing pages can be rendered as a stream of chunks. Their context values
+# are lazy (generators over server-side cursors, callables for counts), so
+# the page header reaches the browser before the listing queries have run.
+
+
+def stream_template(template_name, **context):
+    app = current_app._get_current_object()
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(template_name)
+    return Response(stream_with_context(template.stream(context)))
+
+
+def render_listing(template_name, **context):
+    if current_app.config["STREAM_LISTINGS"]:
+        return stream_template(template_name, **context)
+    return render_template(template_name, **context)
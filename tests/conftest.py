@@ -0,0 +1,138 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+
+# The app reads its database URL from the environment when it is imported.
+# The tests run against a SQLite file of their own, or against the (empty,
+# disposable) database of TEST_DATABASE_URL, e.g. a Postgres one for the
+# tests that need it.
+DATABASE_DIR = tempfile.mkdtemp(prefix="fyyur-tests-")
+os.environ["DATABASE_URL"] = os.environ.get(
+    "TEST_DATABASE_URL", "sqlite:///" + os.path.join(DATABASE_DIR, "fyyur.db")
+)
+# Reads are routed as in production, to a replica engine on the same
+# database (a replica without lag); tests/test_replicas.py swaps in a
+# separate database to tell them apart.
+os.environ["DATABASE_REPLICA_URLS"] = os.environ["DATABASE_URL"]
+
+from app import app as fyyur_app  # noqa: E402
+from cache import page_cache  # noqa: E402
+from entities import entity_cache  # noqa: E402
+from models import Venue, Artist, Show, db  # noqa: E402
+from replicas import ReplicaSet  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    fyyur_app.config["TESTING"] = True
+    with fyyur_app.app_context():
+        if db.engine.dialect.name == "postgresql":
+            db.session.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            db.session.commit()
+        db.create_all()
+        yield fyyur_app
+        db.session.remove()
+        db.drop_all()
+    page_cache.backend.clear()
+    entity_cache.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+# Collects the SQL statements run on the primary and replica databases
+# while the test runs.
+@pytest.fixture
+def statements(app):
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(Engine, "before_cursor_execute", record)
+
+
+# A replica on a database of its own, holding a venue the primary does not
+# have, so a page shows which database it was read from.
+@pytest.fixture
+def replica(app, tmp_path, monkeypatch):
+    url = "sqlite:///" + str(tmp_path / "replica.db")
+    engine = create_engine(url)
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            Venue.__table__.insert(),
+            {
+                "id": 1,
+                "name": "Replica Hall",
+                "city": "Oakland",
+                "state": "CA",
+                "genres": ["Jazz"],
+                "upcoming_shows_count": 0,
+                "past_shows_count": 0,
+            },
+        )
+    engine.dispose()
+    replicas = ReplicaSet([url], app.config["SQLALCHEMY_ENGINE_OPTIONS"])
+    monkeypatch.setitem(app.extensions, "replicas", replicas)
+    yield replicas
+    for engine in replicas.engines:
+        engine.dispose()
+
+
+# Commits and ends the session, as a request does: the next request starts
+# with a session that has not written, so its reads can go to a replica.
+def saved(entity=None):
+    db.session.commit()
+    if entity is not None:
+        entity.id
+    db.session.remove()
+    return entity
+
+
+def add_venue(name="The Musical Hop", city="San Francisco", genres=("Jazz",)):
+    venue = Venue(
+        name=name,
+        city=city,
+        state="CA",
+        address="1015 Folsom Street",
+        phone="123-123-1234",
+        genres=list(genres),
+        image_link="https://example.com/venue.png",
+    )
+    db.session.add(venue)
+    return saved(venue)
+
+
+def add_artist(name="Guns N Petals", city="San Francisco", genres=("Rock n Roll",)):
+    artist = Artist(
+        name=name,
+        city=city,
+        state="CA",
+        phone="326-123-5000",
+        genres=list(genres),
+        image_link="https://example.com/artist.png",
+    )
+    db.session.add(artist)
+    return saved(artist)
+
+
+# Adds `count` shows of the artist at the venue, half of them past.
+def add_shows(venue, artist, count):
+    now = datetime.now()
+    for i in range(count):
+        db.session.add(
+            Show(
+                venue_id=venue.id,
+                artist_id=artist.id,
+                start_time=now + timedelta(days=i - count // 2, hours=1),
+            )
+        )
+    saved()
@@ -0,0 +1,120 @@
+import json
+from conftest import add_artist, add_venue
+from models import Venue, Show
+
+
+def venue_payload(**values):
+    payload = {
+        "name": "The Dueling Pianos Bar",
+        "city": "New York",
+        "state": "New York",
+        "address": "335 Delancey Street",
+        "phone": "9140033333",
+        "genres": ["Classical", "R&B"],
+        "image_link": "https://example.com/pianos.png",
+        "facebook_link": "https://www.facebook.com/theduelingpianos",
+        "website": "https://www.theduelingpianos.com",
+    }
+    payload.update(values)
+    return payload
+
+
+def test_list(client):
+    hop = add_venue()
+    park = add_venue(name="Park Square Live Music & Coffee")
+
+    response = client.get("/api/v1/venues")
+
+    assert response.status_code == 200
+    assert [venue["name"] for venue in response.get_json()] == [
+        "The Musical Hop",
+        "Park Square Live Music & Coffee",
+    ]
+    response = client.get("/api/v1/venues?fields=id,name&after=%d" % hop.id)
+    assert response.get_json() == [
+        {"id": park.id, "name": "Park Square Live Music & Coffee"}
+    ]
+    response = client.get("/api/v1/venues?fields=name&limit=1&format=ndjson")
+    assert response.mimetype == "application/x-ndjson"
+    assert response.get_data(as_text=True) == '{"name": "The Musical Hop"}\n'
+
+
+def test_list_with_unknown_field(client):
+    response = client.get("/api/v1/venues?fields=id,password")
+
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Unknown fields: password"
+
+
+def test_detail(client):
+    artist = add_artist()
+
+    response = client.get("/api/v1/artists/%d" % artist.id)
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["name"] == "Guns N Petals"
+    assert body["genres"] == ["Rock n Roll"]
+    assert (body["upcoming_shows_count"], body["past_shows_count"]) == (0, 0)
+
+
+def test_not_found(client):
+    for path in ("/api/v1/artists/1", "/api/v1/widgets", "/api/v1/widgets/1"):
+        response = client.get(path)
+        assert response.status_code == 404
+        assert response.get_json()["error"] == "Not Found"
+    assert client.delete("/api/v1/venues/1").status_code == 404
+
+
+def test_create(client):
+    response = client.post("/api/v1/venues", json=venue_payload())
+
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body["name"] == "The Dueling Pianos Bar"
+    venue = Venue.query.get(body["id"])
+    assert venue.genres == ["Classical", "R&B"]
+    assert client.get("/api/v1/venues/%d" % venue.id).get_json() == json.loads(
+        response.get_data(as_text=True)
+    )
+
+
+def test_create_with_invalid_fields(client):
+    response = client.post(
+        "/api/v1/venues", json=venue_payload(name="", website="not a url")
+    )
+
+    assert response.status_code == 400
+    assert sorted(response.get_json()["errors"]) == ["name", "website"]
+    assert Venue.query.count() == 0
+
+
+def test_create_show_of_missing_artist(client):
+    venue = add_venue()
+
+    response = client.post(
+        "/api/v1/shows",
+        json={
+            "venue_id": venue.id,
+            "artist_id": 42,
+            "start_time": "2030-05-21 21:30:00",
+        },
+    )
+
+    assert response.status_code == 400
+    assert response.get_json()["errors"] == {
+        "artist_id": ["This artist does not exist"]
+    }
+
+
+def test_create_show_requires_start_time(client):
+    venue = add_venue()
+    artist = add_artist()
+
+    response = client.post(
+        "/api/v1/shows", json={"venue_id": venue.id, "artist_id": artist.id}
+    )
+
+    assert response.status_code == 400
+    assert list(response.get_json()["errors"]) == ["start_time"]
+    assert Show.query.count() == 0
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+from conftest import add_artist, add_venue, saved
+from counters import reconcile_show_counters, roll_show_counters
+from models import Venue, Artist, Show, db
+
+
+def counters(model, entity_id):
+    entity = db.session.query(model).get(entity_id)
+    return entity.upcoming_shows_count, entity.past_shows_count
+
+
+def add_show(venue, artist, start_time):
+    show = Show(venue_id=venue.id, artist_id=artist.id, start_time=start_time)
+    db.session.add(show)
+    return saved(show)
+
+
+def test_moving_a_show(app):
+    hop = add_venue()
+    park = add_venue(name="Park Square Live Music & Coffee")
+    petals = add_artist()
+    quevedo = add_artist(name="Matt Quevedo")
+    show_id = add_show(hop, petals, datetime.now() + timedelta(days=1)).id
+
+    show = Show.query.get(show_id)
+    show.venue_id = park.id
+    show.artist_id = quevedo.id
+    saved()
+
+    assert counters(Venue, hop.id) == (0, 0)
+    assert counters(Venue, park.id) == (1, 0)
+    assert counters(Artist, petals.id) == (0, 0)
+    assert counters(Artist, quevedo.id) == (1, 0)
+
+    # Moved into the past.
+    show = Show.query.get(show_id)
+    show.start_time = datetime.now() - timedelta(days=1)
+    saved()
+
+    assert counters(Venue, park.id) == (0, 1)
+    assert counters(Artist, quevedo.id) == (0, 1)
+
+
+def test_rolling_started_shows(app):
+    now = datetime.now()
+    reconcile_show_counters(now)
+    venue = add_venue()
+    artist = add_artist()
+    add_show(venue, artist, now + timedelta(hours=1))
+    add_show(venue, artist, now + timedelta(hours=3))
+    assert counters(Venue, venue.id) == (2, 0)
+
+    # Nothing moves until the show has started.
+    roll_show_counters(now + timedelta(minutes=30))
+    assert counters(Venue, venue.id) == (2, 0)
+    roll_show_counters(now + timedelta(hours=2))
+
+    assert counters(Venue, venue.id) == (1, 1)
+    assert counters(Artist, artist.id) == (1, 1)
+    # Shows written after the roll are classified against it.
+    add_show(venue, artist, now + timedelta(hours=1, minutes=30))
+    assert counters(Venue, venue.id) == (1, 2)
+
+
+def test_deleting_a_show(app):
+    venue = add_venue()
+    artist = add_artist()
+    past = add_show(venue, artist, datetime.now() - timedelta(days=1))
+    upcoming = add_show(venue, artist, datetime.now() + timedelta(days=1))
+
+    db.session.delete(Show.query.get(past.id))
+    saved()
+    assert counters(Venue, venue.id) == (1, 0)
+    db.session.delete(Show.query.get(upcoming.id))
+    saved()
+
+    assert counters(Venue, venue.id) == (0, 0)
+    assert counters(Artist, artist.id) == (0, 0)
+
+
+def test_reconcile_rebuilds_counters(app):
+    venue = add_venue()
+    artist = add_artist()
+    add_show(venue, artist, datetime.now() - timedelta(days=1))
+    add_show(venue, artist, datetime.now() + timedelta(days=1))
+    for model in (Venue, Artist):
+        db.session.execute(
+            model.__table__.update().values(upcoming_shows_count=7, past_shows_count=-3)
+        )
+    saved()
+
+    reconcile_show_counters()
+
+    assert counters(Venue, venue.id) == (1, 1)
+    assert counters(Artist, artist.id) == (1, 1)
@@ -0,0 +1,92 @@
+from concurrent.futures import ThreadPoolExecutor
+from conftest import add_artist, add_shows, add_venue
+from deletes import background_deletes, delete_in_batches
+from models import Venue, Artist, Show, db
+
+
+def deletes(statements, table):
+    return [
+        statement
+        for statement in statements
+        if statement.startswith('DELETE FROM "%s"' % table)
+    ]
+
+
+def counters(entity):
+    return entity.upcoming_shows_count, entity.past_shows_count
+
+
+# The shows go with the venue in the database (ON DELETE CASCADE); the
+# counters of their artists are lowered beforehand.
+def test_venue_delete_is_one_statement(client, statements):
+    venue = add_venue()
+    other = add_venue(name="Park Square Live Music & Coffee")
+    artist = add_artist()
+    add_shows(venue, artist, 10)
+    add_shows(other, artist, 2)
+    assert counters(Artist.query.get(artist.id)) == (6, 6)
+    db.session.remove()
+    del statements[:]
+
+    response = client.delete("/venues/%d" % venue.id)
+
+    assert response.status_code == 200
+    assert len(deletes(statements, "Venue")) == 1
+    assert deletes(statements, "Show") == []
+    assert Venue.query.get(venue.id) is None
+    assert Show.query.filter_by(venue_id=venue.id).count() == 0
+    assert Show.query.count() == 2
+    assert counters(Artist.query.get(artist.id)) == (1, 1)
+
+
+def test_artist_delete_is_one_statement(client, statements):
+    venue = add_venue()
+    artist = add_artist()
+    add_shows(venue, artist, 4)
+    del statements[:]
+
+    response = client.delete("/artists/%d" % artist.id)
+
+    assert response.status_code == 200
+    assert len(deletes(statements, "Artist")) == 1
+    assert deletes(statements, "Show") == []
+    assert Show.query.count() == 0
+    assert counters(Venue.query.get(venue.id)) == (0, 0)
+
+
+def test_delete_in_batches(app, statements):
+    venue = add_venue()
+    artist = add_artist()
+    add_shows(venue, artist, 10)
+    del statements[:]
+
+    delete_in_batches(Venue, venue.id, 3)
+
+    assert len(deletes(statements, "Show")) == 4
+    assert len(deletes(statements, "Venue")) == 1
+    db.session.remove()
+    assert Venue.query.get(venue.id) is None
+    assert Show.query.count() == 0
+    assert counters(Artist.query.get(artist.id)) == (0, 0)
+
+
+# Entities with more shows than DELETE_BATCH_THRESHOLD are handed over to
+# the background thread.
+def test_large_delete_is_deferred(app, client, statements, monkeypatch):
+    executor = ThreadPoolExecutor(1)
+    monkeypatch.setattr(background_deletes, "executor", executor)
+    monkeypatch.setitem(app.config, "DELETE_BATCH_THRESHOLD", 5)
+    monkeypatch.setitem(app.config, "DELETE_BATCH_SIZE", 4)
+    venue = add_venue()
+    artist = add_artist()
+    add_shows(venue, artist, 10)
+    del statements[:]
+
+    client.delete("/venues/%d" % venue.id)
+    executor.shutdown(wait=True)
+
+    with client.session_transaction() as session:
+        assert session["_flashes"] == [("message", "Venue is being deleted.")]
+    assert len(deletes(statements, "Show")) == 3
+    assert Venue.query.get(venue.id) is None
+    assert counters(Artist.query.get(artist.id)) == (0, 0)
@@ -0,0 +1,36 @@
+import pytest
+from flask import Flask
+from entities import EntityCache
+
+DATABASE = "postgres://pgbouncer:6432/fyyurapp"
+DIRECT = "postgres://db-primary:5432/fyyurapp"
+
+
+def entity_cache(**config):
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=DATABASE, **config)
+    return EntityCache(app)
+
+
+@pytest.mark.parametrize(
+    "config, url",
+    [
+        ({}, DATABASE),
+        ({"ENTITY_CACHE_LISTEN_URI": DIRECT}, DIRECT),
+        ({"DATABASE_PGBOUNCER": True, "ENTITY_CACHE_LISTEN_URI": DIRECT}, DIRECT),
+    ],
+)
+def test_listens_on_direct_connection(config, url):
+    cache = entity_cache(**config)
+
+    assert cache.backend is not None
+    assert cache.needs_listener
+    assert str(cache.url) == url
+
+
+# LISTEN does not work through a transaction pooler.
+def test_disabled_behind_pgbouncer_without_listen_uri():
+    cache = entity_cache(DATABASE_PGBOUNCER=True)
+
+    assert cache.backend is None
+    assert not cache.needs_listener
@@ -0,0 +1,55 @@
+import json
+import os
+from datetime import timedelta
+from conftest import add_venue
+from exporter import export_command
+from models import Venue, db
+
+
+# Runs `flask export venues --since-last-run` and returns the names of the
+# venues it wrote.
+def export(app, directory):
+    result = app.test_cli_runner().invoke(
+        export_command,
+        [
+            "venues",
+            "--format",
+            "jsonl",
+            "--no-compress",
+            "--output",
+            str(directory),
+            "--since-last-run",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    path = result.output.split(" to ")[-1].strip()
+    with open(path) as output:
+        names = sorted(json.loads(line)["name"] for line in output)
+    os.remove(path)
+    return names
+
+
+def stamp(venue_id, updated_at):
+    db.session.query(Venue).filter_by(id=venue_id).update(
+        {"updated_at": updated_at}, synchronize_session=False
+    )
+    db.session.commit()
+
+
+# updated_at is when the writing transaction started, so rows can commit
+# after an export with a timestamp at or below its mark.
+def test_since_last_run_exports_rows_committed_late(app, tmp_path):
+    first = add_venue("First").id
+    second = add_venue("Second").id
+    mark = db.session.query(db.func.max(Venue.updated_at)).scalar()
+    stamp(first, mark)
+    stamp(second, mark - timedelta(seconds=30))
+    assert export(app, tmp_path) == ["First", "Second"]
+
+    # Committed after the export, stamped at and below its mark.
+    stamp(add_venue("Same stamp").id, mark)
+    stamp(add_venue("Earlier stamp").id, mark - timedelta(seconds=10))
+    stamp(second, mark - timedelta(seconds=5))
+
+    assert export(app, tmp_path) == ["Earlier stamp", "Same stamp", "Second"]
+    assert export(app, tmp_path) == []
@@ -0,0 +1,77 @@
+import json
+from importer import import_command
+from conftest import add_artist, add_venue
+from models import Venue, Show, db
+
+
+def write_jsonl(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    return str(path)
+
+
+def venue(**values):
+    row = {
+        "name": "The Musical Hop",
+        "city": "San Francisco",
+        "state": "California",
+        "address": "1015 Folsom Street",
+        "phone": "1231231234",
+        "genres": ["Jazz"],
+        "image_link": "https://example.com/venue.png",
+        "facebook_link": "https://www.facebook.com/TheMusicalHop",
+        "website": "https://www.themusicalhop.com",
+    }
+    row.update(values)
+    return row
+
+
+# JSON numbers and booleans are validated like the text of a form field
+# instead of stopping the import.
+def test_imports_json_scalars_as_form_values(app, tmp_path):
+    path = write_jsonl(
+        tmp_path / "venues.jsonl",
+        [
+            venue(name="Numbers", phone=5551234567, seeking_talent=True),
+            venue(name="Bad phone", phone=12.5),
+            venue(name="Text"),
+        ],
+    )
+
+    result = app.test_cli_runner().invoke(import_command, ["venues", path])
+
+    assert result.exit_code == 0, result.output
+    assert "Imported 2 venues, rejected 1" in result.output
+    imported = {
+        row.name: row
+        for row in db.session.query(Venue.name, Venue.phone, Venue.seeking_talent)
+    }
+    assert sorted(imported) == ["Numbers", "Text"]
+    assert imported["Numbers"].phone == "5551234567"
+    assert imported["Numbers"].seeking_talent is True
+    with open(path + ".rejects.jsonl") as rejects:
+        rejected = [json.loads(line) for line in rejects]
+    assert [(row["line"], list(row["errors"])) for row in rejected] == [(2, ["phone"])]
+
+
+# A show without a start time is rejected rather than dated with the form's
+# default.
+def test_rejects_shows_without_start_time(app, tmp_path):
+    venue = add_venue()
+    artist = add_artist()
+    path = tmp_path / "shows.csv"
+    path.write_text(
+        "venue_id,artist_id,start_time\n"
+        "%(venue)d,%(artist)d,2030-05-21 21:30:00\n"
+        "%(venue)d,%(artist)d,\n" % {"venue": venue.id, "artist": artist.id}
+    )
+
+    result = app.test_cli_runner().invoke(import_command, ["shows", str(path)])
+
+    assert result.exit_code == 0, result.output
+    assert "Imported 1 shows, rejected 1" in result.output
+    assert [str(show.start_time) for show in Show.query] == ["2030-05-21 21:30:00"]
+    with open(str(path) + ".rejects.jsonl") as rejects:
+        rejected = [json.loads(line) for line in rejects]
+    assert [(row["line"], list(row["errors"])) for row in rejected] == [
+        (3, ["start_time"])
+    ]
@@ -0,0 +1,53 @@
+import pytest
+from flask import g
+from sqlalchemy.exc import OperationalError
+from instrumentation import instrumentation
+from models import db
+
+
+@pytest.fixture
+def switch(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(instrumentation, "switch_path", str(tmp_path / "switch"))
+    monkeypatch.setitem(app.config, "INSTRUMENTATION_TOKEN", "secret")
+    yield
+    instrumentation.enable()
+
+
+def test_failed_statements_leave_no_timers(app):
+    with app.test_request_context("/"):
+        instrumentation._before_request()
+        with pytest.raises(OperationalError):
+            db.session.execute("SELECT * FROM missing_table")
+        db.session.rollback()
+        db.session.execute("SELECT 1")
+
+        assert g.request_stats.queries == 1
+        assert "query_started" not in db.session.connection().info
+
+
+def test_switching_needs_the_token(client, switch):
+    assert client.post("/instrumentation", data={"enabled": "0"}).status_code == 403
+    forged = client.post(
+        "/instrumentation",
+        data={"enabled": "0"},
+        headers={"Authorization": "Bearer wrong"},
+    )
+    assert forged.status_code == 403
+    assert instrumentation.enabled
+
+
+def test_switch_reaches_every_worker(client, switch):
+    response = client.post(
+        "/instrumentation",
+        data={"enabled": "0"},
+        headers={"Authorization": "Bearer secret"},
+    )
+    assert response.get_json() == {"enabled": False}
+    assert "Server-Timing" not in client.get("/").headers
+
+    # Another worker switches it back on; this one follows within a second.
+    with open(instrumentation.switch_path, "w") as switch_file:
+        switch_file.write("on")
+    instrumentation._switch_checked = 0.0
+
+    assert "Server-Timing" in client.get("/").headers
@@ -0,0 +1,30 @@
+from prometheus_client import REGISTRY
+from models import db
+
+
+def checked_out(engine):
+    return REGISTRY.get_sample_value(
+        "fyyur_db_pool_checked_out", {"engine": engine.pool.label}
+    )
+
+
+# The primary and the replica pools are reported on their own.
+def test_pool_metrics_per_engine(app, replica):
+    primary = db.engine
+    (replica_engine,) = replica.engines
+    assert primary.pool.label != replica_engine.pool.label
+
+    with primary.connect():
+        with primary.connect():
+            with replica_engine.connect():
+                assert checked_out(primary) == 2
+                assert checked_out(replica_engine) == 1
+    assert checked_out(primary) == checked_out(replica_engine) == 0
+
+
+def test_label_survives_dispose(app):
+    label = db.engine.pool.label
+    db.engine.dispose()
+
+    assert db.engine.pool.label == label
+    assert label.endswith(".db")
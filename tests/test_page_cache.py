@@ -0,0 +1,81 @@
+import re
+import time
+from datetime import datetime, timedelta
+from conftest import add_artist, add_venue, saved
+from cache import page_cache, page_key
+from models import Venue, Show, db
+
+
+def show_counts(page):
+    return tuple(
+        int(count)
+        for count in re.findall(r"(\d+) (?:Upcoming|Past)", page.get_data(as_text=True))
+    )
+
+
+def expires_in(kind, entity_id):
+    value, expires = page_cache.backend._entries[page_key(kind, entity_id)]
+    return expires - time.monotonic()
+
+
+def test_hit_is_served_from_cache(client, statements):
+    venue = add_venue()
+    first = client.get("/venues/%d" % venue.id)
+    # A change the app does not know about is not seen until the page expires.
+    db.session.execute(Venue.__table__.update().values(name="Renamed"))
+    saved()
+    del statements[:]
+    hits = page_cache.hits
+
+    second = client.get("/venues/%d" % venue.id)
+
+    assert second.data == first.data
+    assert b"The Musical Hop" in second.data
+    assert page_cache.hits == hits + 1
+    assert statements == []
+
+
+def test_edit_evicts_page(app, client):
+    venue = add_venue()
+    client.get("/venues/%d" % venue.id)
+    form = {
+        "name": "The Musical Hop Annex",
+        "city": "San Francisco",
+        "state": "California",
+        "address": "1015 Folsom Street",
+        "phone": "1231231234",
+        "genres": ["Jazz"],
+        "image_link": "https://example.com/venue.png",
+        "facebook_link": "https://www.facebook.com/TheMusicalHop",
+        "website": "https://www.themusicalhop.com",
+    }
+
+    client.post("/venues/%d/edit" % venue.id, data=form)
+
+    assert page_key("venue", venue.id) not in page_cache.backend._entries
+    page = app.test_client().get("/venues/%d" % venue.id)
+    assert b"The Musical Hop Annex" in page.data
+
+
+# The page expires when its next upcoming show starts, so that show moves
+# to the past section on time.
+def test_expires_when_next_show_starts(app, client):
+    venue = add_venue()
+    artist = add_artist()
+    assert show_counts(client.get("/venues/%d" % venue.id)) == (0, 0)
+    assert expires_in("venue", venue.id) > app.config["PAGE_CACHE_TIMEOUT"] - 5
+    db.session.add(
+        Show(
+            venue_id=venue.id,
+            artist_id=artist.id,
+            start_time=datetime.now() + timedelta(seconds=1),
+        )
+    )
+    saved()
+    page_cache.delete_many(page_key("venue", venue.id))
+
+    assert show_counts(client.get("/venues/%d" % venue.id)) == (1, 0)
+    assert 0 < expires_in("venue", venue.id) <= 1
+    time.sleep(1.1)
+
+    assert show_counts(client.get("/venues/%d" % venue.id)) == (0, 1)
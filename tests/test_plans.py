@@ -0,0 +1,13 @@
+from plans import capture_queries
+
+
+# The listing and search SELECTs run on the replica; they are checked too.
+def test_captures_replica_queries(app, replica):
+    captured = capture_queries(
+        app,
+        [("GET", "/venues", None), ("POST", "/venues/search", {"search_term": "a"})],
+    )
+
+    paths = {path for path, statement, parameters in captured}
+    assert paths == {"/venues", "/venues/search"}
+    assert all('FROM "Venue"' in statement for _, statement, _ in captured)
@@ -0,0 +1,73 @@
+from datetime import datetime
+import pytest
+from werkzeug.exceptions import NotFound
+from conftest import add_artist, add_shows, add_venue
+from models import Venue, Show
+from projections import detail_page, show_counts, venue_area_query, venue_areas
+
+
+def test_detail_page_splits_and_pages_shows(app):
+    venue = add_venue()
+    artist = add_artist()
+    add_shows(venue, artist, 10)
+
+    with app.test_request_context("/venues/%d?per_page=2" % venue.id):
+        page = detail_page(Venue, Show.venue_id, venue.id)
+
+    assert page.name == "The Musical Hop"
+    assert (page.upcoming_shows_count, page.past_shows_count) == (5, 5)
+    now = datetime.now()
+    upcoming = [show["start_time"] for show in page.upcoming_shows]
+    past = [show["start_time"] for show in page.past_shows]
+    assert len(upcoming) == len(past) == 2
+    assert all(start >= now for start in upcoming) and upcoming == sorted(upcoming)
+    assert all(start < now for start in past)
+    assert past == sorted(past, reverse=True)
+    assert page.upcoming_shows[0]["artist_name"] == "Guns N Petals"
+    assert page.upcoming_shows[0]["venue_name"] == "The Musical Hop"
+    assert page.upcoming_page.prev_cursor is None
+    assert page.upcoming_page.next_cursor is not None
+
+    # Each section is paged on its own cursor.
+    with app.test_request_context(
+        "/venues/%d?per_page=2&upcoming_after=%s"
+        % (venue.id, page.upcoming_page.next_cursor)
+    ):
+        following = detail_page(Venue, Show.venue_id, venue.id)
+
+    assert [show["start_time"] for show in following.upcoming_shows] > upcoming
+    assert following.upcoming_page.prev_cursor is not None
+    assert following.past_shows == page.past_shows
+
+
+def test_detail_page_of_missing_entity(app):
+    with app.test_request_context("/venues/1"):
+        with pytest.raises(NotFound):
+            detail_page(Venue, Show.venue_id, 1)
+
+
+def test_show_counts(app):
+    venue = add_venue()
+    artist = add_artist()
+    add_shows(venue, artist, 7)
+
+    assert show_counts(datetime.now(), Show.artist_id == artist.id) == (4, 3)
+    assert show_counts(datetime.now(), Show.venue_id == venue.id + 1) == (0, 0)
+
+
+def test_venue_areas_group_adjacent_venues(app):
+    add_venue(name="Park Square Live Music & Coffee")
+    add_venue(name="The Dueling Pianos Bar", city="New York")
+    add_venue(name="The Musical Hop")
+
+    areas = list(venue_areas(venue_area_query()))
+
+    assert [(area["city"], area["state"]) for area in areas] == [
+        ("New York", "CA"),
+        ("San Francisco", "CA"),
+    ]
+    assert [venue["name"] for venue in areas[1]["venues"]] == [
+        "Park Square Live Music & Coffee",
+        "The Musical Hop",
+    ]
+    assert areas[1]["venues"][0]["num_upcoming_shows"] == 0
@@ -0,0 +1,40 @@
+from cache import page_cache
+from conftest import add_artist, add_shows, add_venue
+
+
+def pages(venue, artist):
+    return [
+        ("GET", "/shows", None),
+        ("POST", "/shows/search", {"search_term": "petals"}),
+        ("GET", "/venues/%d" % venue.id, None),
+        ("GET", "/artists/%d" % artist.id, None),
+    ]
+
+
+def count_statements(client, statements, method, path, data):
+    page_cache.backend.clear()
+    del statements[:]
+    response = client.open(path, method=method, data=data)
+    assert response.status_code == 200
+    return len(statements)
+
+
+# The show listings and detail pages fetch their show cards with one joined
+# query, so the number of statements does not depend on the number of
+# shows.
+def test_show_pages_run_constant_number_of_statements(client, statements):
+    venue = add_venue()
+    artist = add_artist()
+    add_shows(venue, artist, 2)
+    few = {
+        path: count_statements(client, statements, method, path, data)
+        for method, path, data in pages(venue, artist)
+    }
+
+    add_shows(venue, artist, 40)
+    many = {
+        path: count_statements(client, statements, method, path, data)
+        for method, path, data in pages(venue, artist)
+    }
+
+    assert many == few
@@ -0,0 +1,75 @@
+import os
+from conftest import add_venue
+from models import Venue
+from replicas import ReplicaSet
+
+
+def venue_form(name):
+    return {
+        "name": name,
+        "city": "San Francisco",
+        "state": "California",
+        "address": "1015 Folsom Street",
+        "phone": "1231231234",
+        "genres": ["Jazz"],
+        "image_link": "https://example.com/venue.png",
+        "facebook_link": "https://www.facebook.com/TheMusicalHop",
+        "website": "https://www.themusicalhop.com",
+    }
+
+
+def test_get_reads_from_replica(client, replica):
+    add_venue(name="Primary Hall")
+
+    page = client.get("/venues").get_data(as_text=True)
+
+    assert "Replica Hall" in page
+    assert "Primary Hall" not in page
+
+
+def test_search_form_reads_from_replica(client, replica):
+    add_venue(name="Primary Hall")
+
+    page = client.post("/venues/search", data={"search_term": "Hall"})
+
+    assert "Replica Hall" in page.get_data(as_text=True)
+    assert "Primary Hall" not in page.get_data(as_text=True)
+
+
+# The write goes to the primary, and the browser that made it reads from
+# the primary for REPLICA_STICKY_SECONDS.
+def test_post_writes_to_primary_and_sticks(app, client, replica):
+    response = client.post("/venues/create", data=venue_form("Primary Hall"))
+
+    assert response.status_code == 200
+    assert [venue.name for venue in Venue.query.all()] == ["Primary Hall"]
+    page = client.get("/venues").get_data(as_text=True)
+    assert "Primary Hall" in page
+    assert "Replica Hall" not in page
+    # Another browser still reads from the replica.
+    page = app.test_client().get("/venues").get_data(as_text=True)
+    assert "Replica Hall" in page
+
+
+# A cached page is served to every visitor; it is rendered from the primary
+# even when the request could read from a replica.
+def test_page_cache_miss_renders_from_primary(client, replica):
+    venue = add_venue(name="Primary Hall")
+    assert venue.id == 1
+
+    for _ in range(2):
+        page = client.get("/venues/1").get_data(as_text=True)
+        assert "Primary Hall" in page
+        assert "Replica Hall" not in page
+
+
+def test_unreachable_replica_falls_back_to_primary(app, client, monkeypatch, tmp_path):
+    missing = os.path.join(str(tmp_path), "missing", "replica.db")
+    replicas = ReplicaSet(["sqlite:///" + missing])
+    monkeypatch.setitem(app.extensions, "replicas", replicas)
+    add_venue(name="Primary Hall")
+
+    page = client.get("/venues").get_data(as_text=True)
+
+    assert "Primary Hall" in page
+    assert replicas.choose() is None
@@ -0,0 +1,110 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import search
+from conftest import add_artist, add_shows, add_venue
+from models import db
+from search import find_artists, find_venues, trigram_similarity
+
+
+# Runs each test on both search implementations: the ranked SQL query
+# used on Postgres and the Python fallback used on other databases. On
+# SQLite the SQL query gets pg_trgm's similarity() as a Python function.
+@pytest.fixture(params=["sql", "python"])
+def search_path(request, app, monkeypatch):
+    if request.param == "sql" and db.engine.dialect.name != "postgresql":
+
+        def add_similarity(dbapi_connection, connection_record):
+            dbapi_connection.create_function("similarity", 2, trigram_similarity)
+
+        # Reads may go to the replica engines as well.
+        engines = [db.engine] + app.extensions["replicas"].engines
+        event.listen(Engine, "connect", add_similarity)
+        request.addfinalizer(lambda: event.remove(Engine, "connect", add_similarity))
+        for engine in engines:
+            engine.dispose()
+            request.addfinalizer(engine.dispose)
+    monkeypatch.setattr(search, "_is_postgres", lambda: request.param == "sql")
+    return request.param
+
+
+def names(result):
+    total, rows = result
+    return total, [row.name for row in rows]
+
+
+def test_matches_case_insensitive_substrings(search_path):
+    add_venue("The Musical Hop")
+    add_venue("Park Square Live Music & Coffee")
+    add_venue("The Dueling Pianos Bar", city="New York")
+
+    assert names(find_venues("hop")) == (1, ["The Musical Hop"])
+    assert names(find_venues("MUSIC")) == (
+        2,
+        ["The Musical Hop", "Park Square Live Music & Coffee"],
+    )
+    assert names(find_venues("nothing")) == (0, [])
+
+
+def test_matches_city(search_path):
+    add_venue("The Musical Hop", city="San Francisco")
+    add_venue("The Dueling Pianos Bar", city="New York")
+
+    assert names(find_venues("new york")) == (1, ["The Dueling Pianos Bar"])
+
+
+def test_name_matches_rank_before_city_matches(search_path):
+    add_artist("Band of Horses", city="Portland")
+    add_artist("The Wild Sax Band", city="San Francisco")
+    add_artist("Matt Quevedo", city="Bandon")
+
+    total, ranked = names(find_artists("band"))
+
+    assert total == 3
+    assert ranked[-1] == "Matt Quevedo"
+    assert set(ranked[:2]) == {"Band of Horses", "The Wild Sax Band"}
+
+
+def test_results_are_limited(app, search_path):
+    for i in range(5):
+        add_artist("Band %d" % i)
+    app.config["SEARCH_LIMIT"] = 3
+    try:
+        total, rows = find_artists("band")
+    finally:
+        app.config["SEARCH_LIMIT"] = 50
+
+    assert (total, len(rows)) == (5, 3)
+
+
+# Whole-genre matches use the array containment operator, which only
+# Postgres has.
+def test_matches_genre(search_path):
+    if search_path == "sql" and db.engine.dialect.name != "postgresql":
+        pytest.skip("genre containment needs Postgres")
+    add_venue("The Musical Hop", genres=["Jazz", "Folk"])
+    add_venue("Park Square Live Music & Coffee", genres=["Rock n Roll"])
+
+    assert names(find_venues("folk")) == (1, ["The Musical Hop"])
+
+
+def test_results_carry_upcoming_show_counts(search_path):
+    venue = add_venue("The Musical Hop")
+    artist = add_artist("Guns N Petals")
+    add_shows(venue, artist, 4)
+
+    assert [row.upcoming_shows_count for row in find_venues("hop")[1]] == [2]
+    assert [row.upcoming_shows_count for row in find_artists("petals")[1]] == [2]
+
+
+def test_search_pages(client, search_path):
+    add_venue("The Musical Hop")
+    add_artist("Guns N Petals")
+
+    venues = client.post("/venues/search", data={"search_term": "hop"})
+    artists = client.post("/artists/search", data={"search_term": "petals"})
+
+    assert venues.status_code == 200
+    assert b"The Musical Hop" in venues.data
+    assert artists.status_code == 200
+    assert b"Guns N Petals" in artists.data
@@ -0,0 +1,55 @@
+import json
+from types import SimpleNamespace
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from models import db
+from slowlog import SlowQueryLog, slow_query_log
+
+
+def test_off_by_default(app):
+    assert app.config["SLOW_QUERY_THRESHOLD_MS"] is None
+    assert slow_query_log.threshold is None
+
+
+# Logs every statement, remembering two of them.
+@pytest.fixture
+def slow_log(app):
+    log = SlowQueryLog(
+        SimpleNamespace(
+            config={"SLOW_QUERY_THRESHOLD_MS": 0, "SLOW_QUERY_MAX_GROUPS": 2}
+        )
+    )
+    yield log
+    event.remove(Engine, "before_cursor_execute", log._before_cursor_execute)
+    event.remove(Engine, "after_cursor_execute", log._after_cursor_execute)
+
+
+def test_remembers_the_latest_groups(app, slow_log, caplog):
+    for statement in ("SELECT 1", "SELECT 2", "SELECT 1", "SELECT 3", "SELECT 2"):
+        db.session.execute(statement)
+
+    assert len(slow_log.groups) == 2
+    entries = [json.loads(record.getMessage()) for record in caplog.records]
+    # SELECT 2 was forgotten when SELECT 3 came, so it is logged again with
+    # its plan; SELECT 1, within its interval, is not.
+    assert [entry["statement"] for entry in entries] == [
+        "SELECT 1",
+        "SELECT 2",
+        "SELECT 3",
+        "SELECT 2",
+    ]
+    assert all("plan" in entry for entry in entries)
+
+
+def test_failed_statements_leave_no_timers(app, slow_log, caplog):
+    with pytest.raises(OperationalError):
+        db.session.execute("SELECT * FROM missing_table")
+    db.session.rollback()
+    db.session.execute("SELECT 1")
+
+    assert [json.loads(r.getMessage())["statement"] for r in caplog.records] == [
+        "SELECT 1"
+    ]
+    assert "slow_query_started" not in db.session.connection().info
@@ -0,0 +1,59 @@
+import atexit
+import time
+from datetime import datetime
+from flask import g, request
+from instrumentation import RequestLog
+
+# Traffic capture for replay load tests (`python -m benchmarks replay`).
+# With TRAFFIC_CAPTURE on, every request except static files is appended to
+# TRAFFIC_CAPTURE_PATH as one JSON line: when it arrived, method, route,
+# path with query string, form fields or JSON body, status and duration.
+# Lines are written in batches like the request log. Form payloads are
+# recorded as sent, so a capture holds whatever users typed into the forms.
+
+
+class TrafficRecorder:
+    def __init__(self, app=None):
+        self.log = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get("TRAFFIC_CAPTURE"):
+            return
+        self.log = RequestLog(
+            app.config["TRAFFIC_CAPTURE_PATH"],
+            app.config.get("REQUEST_LOG_BATCH_SIZE", 100),
+            app.config.get("REQUEST_LOG_FLUSH_INTERVAL", 5),
+        )
+        atexit.register(self.log.flush)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_request(self):
+        g.traffic_started = time.perf_counter()
+
+    def _after_request(self, response):
+        started = g.get("traffic_started")
+        if started is None or request.endpoint == "static":
+            return response
+        entry = {
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "method": request.method,
+            "route": request.url_rule.rule if request.url_rule else None,
+            "path": request.full_path if request.query_string else request.path,
+            "status": response.status_code,
+        }
+        if request.is_json:
+            entry["json"] = request.get_data(as_text=True)
+        elif request.form:
+            entry["form"] = request.form.to_dict(flat=False)
+        response.call_on_close(lambda: self._record(entry, started))
+        return response
+
+    def _record(self, entry, started):
+        entry["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        self.log.append(entry)
+
+
+traffic = TrafficRecorder()